@@ -3,30 +3,85 @@ import os
 import sys
 import subprocess
 import json
+import hashlib
+import site
+from importlib import metadata
 from pathlib import Path
-import asyncio
-import qasync
-from PyQt6.QtWidgets import QApplication
+
+try:
+    from packaging.requirements import InvalidRequirement, Requirement
+except ImportError:
+    # pip, which installs the requirements anyway, vendors packaging
+    from pip._vendor.packaging.requirements import InvalidRequirement, Requirement
+
+DEPENDENCY_MANIFEST = Path('cache') / 'dependencies.json'
+
+def _environment_key(requirements: bytes) -> str:
+    """Hash the requirements together with the interpreter and its package directories"""
+    digest = hashlib.sha256(requirements)
+    digest.update(f"{sys.executable}|{sys.version}|{sys.prefix}".encode())
+    # Installing or removing a distribution changes its site-packages mtime.
+    # The site module of old virtualenvs lacks these functions
+    paths = set(getattr(site, 'getsitepackages', list)())
+    if hasattr(site, 'getusersitepackages'):
+        paths.add(site.getusersitepackages())
+    for path in sorted(paths):
+        try:
+            digest.update(f"{path}:{os.stat(path).st_mtime_ns}".encode())
+        except OSError:
+            continue
+    return digest.hexdigest()
+
+def find_missing_requirements(requirements):
+    """Return requirements whose distribution is missing or does not satisfy the version specifier"""
+    missing = []
+    for line in requirements:
+        line = line.split('#')[0].strip()
+        if not line:
+            continue
+        try:
+            req = Requirement(line)
+        except InvalidRequirement:
+            # Left for pip to resolve or report
+            missing.append(line)
+            continue
+        # Requirements for other platforms or Python versions
+        if req.marker is not None and not req.marker.evaluate():
+            continue
+        try:
+            installed = metadata.version(req.name)
+        except metadata.PackageNotFoundError:
+            missing.append(line)
+            continue
+        if not req.specifier.contains(installed, prereleases=True):
+            missing.append(line)
+    return missing
 
 def check_dependencies():
     """Check if all required dependencies are installed"""
     try:
-        with open('requirements.txt', 'r') as f:
-            requirements = f.read().splitlines()
+        with open('requirements.txt', 'rb') as f:
+            requirements = f.read()
         
-        # Try importing each requirement
-        missing = []
-        for req in requirements:
-            package = req.split('>=')[0]
-            try:
-                __import__(package.lower())
-            except ImportError:
-                missing.append(req)
+        # Skip the check when nothing changed since the last successful one
+        key = _environment_key(requirements)
+        try:
+            if json.loads(DEPENDENCY_MANIFEST.read_text()).get('key') == key:
+                return
+        except (OSError, ValueError):
+            pass
+        
+        # Check installed distribution metadata instead of importing each package
+        missing = find_missing_requirements(requirements.decode('utf-8').splitlines())
         
         if missing:
             print("Installing missing dependencies...")
             subprocess.check_call([sys.executable, "-m", "pip", "install"] + missing)
             print("Dependencies installed successfully!")
+            key = _environment_key(requirements)
+            
+        DEPENDENCY_MANIFEST.parent.mkdir(exist_ok=True)
+        DEPENDENCY_MANIFEST.write_text(json.dumps({"key": key}))
     except Exception as e:
         print(f"Error checking dependencies: {e}")
         sys.exit(1)
@@ -80,6 +135,10 @@ def main():
     
     # Run the application
     try:
+        import asyncio
+        import qasync
+        from PyQt6.QtWidgets import QApplication
+        
         app = QApplication(sys.argv)
         loop = qasync.QEventLoop(app)
         asyncio.set_event_loop(loop)
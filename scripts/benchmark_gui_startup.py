@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Measure cold and warm start of the main window.
+
+Each run launches the application in a fresh offscreen process and records,
+relative to process launch:
+  - time to first paint of the main window
+  - time until the AI handler is ready
+  - time to the first response to a typed command
+
+The OpenAI client is replaced by a local stub (after importing openai, so its
+import cost is still paid), so no network access or API key is needed.
+A cold run starts from an empty data directory; warm runs reuse it.
+
+Usage: python scripts/benchmark_gui_startup.py [--runs N]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+root_path = Path(__file__).parent.parent
+
+def child(start_time: float):
+    """Run the window once and print the timings as JSON"""
+    import asyncio
+    import types
+    sys.path.insert(0, str(root_path / 'src'))
+
+    from PyQt6.QtCore import QEvent, QObject
+    from PyQt6.QtWidgets import QApplication, QMessageBox
+    import qasync
+
+    app = QApplication(sys.argv)
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+
+    from core.ai_handler import AIHandler, openai
+    from gui.main_window import MainWindow
+
+    class StubCompletions:
+        async def create(self, model, messages, stream=False, **kwargs):
+            text = "Hello! How can I help you today?"
+            if not stream:
+                message = types.SimpleNamespace(content=text)
+                return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+            async def chunks():
+                for word in text.split(' '):
+                    delta = types.SimpleNamespace(content=word + ' ')
+                    yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+            return chunks()
+
+    def create_stub_client(self, api_key):
+        openai.AsyncOpenAI  # Pay the real import cost
+        return types.SimpleNamespace(
+            chat=types.SimpleNamespace(completions=StubCompletions()),
+            close=lambda: asyncio.sleep(0)
+        )
+
+    AIHandler._create_client = create_stub_client
+    QMessageBox.exec = lambda self: 0
+
+    timings = {}
+
+    def mark(name):
+        timings.setdefault(name, time.time() - start_time)
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint:
+                mark('first_paint')
+            return False
+
+    window = MainWindow()
+    watcher = PaintWatcher()
+    window.installEventFilter(watcher)
+    window.subsystem_ready.connect(lambda name, ok: mark(f'{name}_ready'))
+    window.show()
+
+    async def first_response():
+        while 'first_paint' not in timings:
+            await asyncio.sleep(0.001)
+        window.input_field.setText("hello")
+        await window._handle_command_async()
+        mark('first_response')
+
+    with loop:
+        loop.run_until_complete(first_response())
+    print(json.dumps(timings))
+
+def run_once(data_dir: str) -> dict:
+    start_time = time.time()
+    result = subprocess.run(
+        [sys.executable, __file__, '--child', str(start_time)],
+        capture_output=True, text=True, cwd=data_dir,
+        env=dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def prepare_data_dir() -> str:
+    data_dir = tempfile.mkdtemp(prefix='assistant-bench-')
+    os.symlink(root_path / 'assets', os.path.join(data_dir, 'assets'))
+    with open(os.path.join(data_dir, 'config.json'), 'w') as f:
+        json.dump({"ai": {"api_key": "benchmark"}, "voice": {"enabled": False}}, f)
+    return data_dir
+
+def report(label: str, runs: list):
+    print(f"\n{label} start ({len(runs)} run{'s' if len(runs) > 1 else ''}, median)")
+    for key in ('first_paint', 'handler_ready', 'client_ready', 'first_response'):
+        values = [run[key] for run in runs if key in run]
+        if values:
+            print(f"  {key.replace('_', ' '):16} {statistics.median(values) * 1000:8.1f} ms")
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == '--child':
+        child(float(sys.argv[2]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help='cold/warm runs to take the median of')
+    args = parser.parse_args()
+
+    cold_runs, warm_runs = [], []
+    for _ in range(args.runs):
+        data_dir = prepare_data_dir()
+        try:
+            cold_runs.append(run_once(data_dir))
+            warm_runs.append(run_once(data_dir))
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report("Cold", cold_runs)
+    report("Warm", warm_runs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Report import-time cost of the assistant's startup modules.
+
+Runs each module import in a fresh interpreter with ``-X importtime`` and
+prints the total, the slowest imports, and whether heavy optional
+dependencies were pulled in eagerly.
+
+Usage: python scripts/benchmark_startup.py [module ...] [--top N] [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+src_path = Path(__file__).parent.parent / 'src'
+
+DEFAULT_MODULES = ['core.ai_handler', 'gui.main_window']
+HEAVY_MODULES = ['openai', 'httpx', 'pyttsx3', 'speech_recognition', 'pocketsphinx', 'numpy']
+
+def measure_import(module: str):
+    """Import module in a fresh interpreter; return wall time and importtime rows"""
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=str(src_path), QT_QPA_PLATFORM='offscreen')
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, env=env, cwd=src_path.parent
+    )
+    wall_time = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    loaded = [m for m in result.stdout.strip().split(',') if m]
+    return wall_time, rows, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list')
+    parser.add_argument('--runs', type=int, default=3, help='runs per module (median is reported)')
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [measure_import(module) for _ in range(args.runs)]
+        wall_time = statistics.median(run[0] for run in runs)
+        _, rows, loaded = runs[-1]
+        target = next((row for row in rows if row[2].strip() == module), None)
+
+        print(f"\n{module}")
+        print(f"  interpreter + import wall time: {wall_time * 1000:.1f} ms (median of {args.runs})")
+        if target:
+            print(f"  cumulative import time:         {target[1] / 1000:.1f} ms")
+        print(f"  heavy modules loaded eagerly:   {', '.join(loaded) or 'none'}")
+        print("  slowest imports (self time):")
+        for self_us, cumulative_us, name in sorted(rows, reverse=True)[:args.top]:
+            print(f"    {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms cumulative  {name.strip()}")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,41 @@
-import openai
-from typing import Tuple, List, Dict
-import pyttsx3
-import speech_recognition as sr
+import asyncio
+import concurrent.futures
+import random
+from typing import Tuple, List, Dict, Optional, AsyncIterator, Iterable
 from enum import Enum
 from utils.logger import AIAssistantError
-from textblob import TextBlob
+from utils.config import Config
+from utils.lazy_import import lazy_import
+from utils.process_pool import spawn_process_pool
+from .response_cache import ResponseCache
+from .similarity_index import SimilarityIndex
+from .context_builder import ContextBuilder
+from .conversation_store import ConversationStore
+from .search_index import ConversationSearchIndex
+from .sentiment import SentimentAnalyzer
+from .tts_worker import SpeechWorker
+from .audio_cache import AudioCache
+from .voice_capture import MicrophoneStream, load_calibration
+from .speech_queue import SpeechQueue
+from .recognition_pool import RecognitionPipeline, recognize_sphinx
+from .wake_word import WakeWordDetector
 import json
 from datetime import datetime
 import hashlib
 import os
-import pickle
-import nltk
+import queue
+from functools import partial
 import threading
 
+# Heavy dependencies are imported on first use to keep startup fast
+openai = lazy_import('openai')
+httpx = lazy_import('httpx')
+pyttsx3 = lazy_import('pyttsx3')
+sr = lazy_import('speech_recognition')
+
 class AIState(Enum):
     IDLE = "idle"
+    LISTENING = "listening"
     HAPPY = "happy"
     SAD = "sad"
     CONFUSED = "confused"
@@ -28,109 +49,509 @@ class AIError(AIAssistantError):
     pass
 
 class AIHandler:
-    def __init__(self, api_key: str = None):
+    # Subsystems that are created on first use and can be warmed up in the background
+    SUBSYSTEMS = ('client', 'tts', 'stt')
+    
+    def __init__(self, api_key: str = None, config: Optional[Config] = None):
         if not api_key:
             raise AIError("OpenAI API key is required")
             
-        # Initialize NLTK data
-        self._initialize_nltk()
-            
-        try:
-            self.client = openai.OpenAI(api_key=api_key)
-        except Exception as e:
-            raise AIError(f"Failed to initialize OpenAI client: {str(e)}")
-        
-        # Initialize TTS engine
-        try:
-            self.tts_engine = pyttsx3.init()
-        except Exception as e:
-            raise AIError(f"Failed to initialize text-to-speech engine: {str(e)}")
+        self.config = config or Config()
+        self.api_key = api_key
         
-        # Initialize STT recognizer with noise adjustment
-        self.recognizer = sr.Recognizer()
-        self.recognizer.dynamic_energy_threshold = True
-        self.recognizer.energy_threshold = 4000
+        # The API client, TTS engine and STT recognizer are created on first use
+        self._client = None
+        self._speech_worker: Optional[SpeechWorker] = None
+        self._recognizer = None
+        self._init_locks = {name: threading.Lock() for name in self.SUBSYSTEMS}
+        self._warmups: Dict[str, concurrent.futures.Future] = {}
         self.is_listening = False
+        self._microphone_stream: Optional[MicrophoneStream] = None
+        self._recognizer_calibrated = False
+        self.speech_queue: Optional[SpeechQueue] = None
+        self._sphinx_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
         
         self.state = AIState.IDLE
+        self.sentiment_analyzer = SentimentAnalyzer()
         
         self.conversation_history: List[Dict] = []
         self.max_history_length = 10  # Keep last 10 exchanges
         
+        # Prompt context is limited by tokens; turns that fall out of the
+        # budget are folded into a rolling summary in the background
+        self.context_builder = ContextBuilder(self.config.get('ai.context_token_budget', 3000))
+        self.context_summary = ""
+        self._summarized_messages = 0  # Leading history entries covered by the summary
+        self._summary_task: Optional[asyncio.Task] = None
+        
+        # Every message is journaled as it is added; the in-memory history is
+        # always the newest part of the journal
+        history_dir = self.config.get('history.directory', 'history')
+        self.conversation_store = ConversationStore(
+            os.path.join(history_dir, 'conversation.jsonl'),
+            fsync=self.config.get('history.fsync', False)
+        )
+        # Current and archived journals are searchable
+        self.search_index = ConversationSearchIndex(
+            os.path.join(history_dir, 'search_index.db'),
+            os.path.join(history_dir, 'conversation*.jsonl')
+        )
+        if self.config.get('history.restore_on_start', True):
+            self.conversation_history = self.conversation_store.tail(self.max_history_length * 2)
+        
+        # In-flight API requests by cache key, with the user message each one added
+        self._inflight: Dict[str, Tuple[asyncio.Future, Dict]] = {}
+        
         # Initialize response cache
         self.cache_dir = os.path.join('cache')
         os.makedirs(self.cache_dir, exist_ok=True)
-        self.cache_file = os.path.join(self.cache_dir, 'response_cache.pkl')
+        self.cache_file = os.path.join(self.cache_dir, 'response_cache.db')
+        self._calibration_file = os.path.join(self.cache_dir, 'vad_calibration.json')
         self.load_cache()
         
-    def _initialize_nltk(self):
-        """Initialize NLTK data required for TextBlob"""
+    @property
+    def client(self) -> "openai.AsyncOpenAI":
+        """The OpenAI API client, created on first use"""
+        if self._client is None:
+            with self._init_locks['client']:
+                if self._client is None:
+                    try:
+                        self._client = self._create_client(self.api_key)
+                    except Exception as e:
+                        raise AIError(f"Failed to initialize OpenAI client: {str(e)}")
+        return self._client
+        
+    @property
+    def speech_worker(self) -> SpeechWorker:
+        """The text-to-speech worker thread, started on first use"""
+        if self._speech_worker is None:
+            with self._init_locks['tts']:
+                if self._speech_worker is None:
+                    audio_cache = None
+                    if self.config.get('voice.audio_cache', True):
+                        audio_cache = AudioCache(
+                            os.path.join(self.cache_dir, 'speech'),
+                            max_size_bytes=int(self.config.get('voice.audio_cache_mb', 100) * 1024 * 1024)
+                        )
+                    worker = SpeechWorker(
+                        lambda: pyttsx3.init(),
+                        volume=self.config.get('voice.volume', 1.0),
+                        rate=self.config.get('voice.rate', 150),
+                        voice=self.config.get('voice.voice_id'),
+                        audio_cache=audio_cache
+                    )
+                    worker.start()
+                    self._speech_worker = worker
+        return self._speech_worker
+        
+    def _start_tts(self):
+        """Start the TTS worker and wait until its engine exists"""
         try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            print("Downloading required NLTK data...")
-            nltk.download('punkt', quiet=True)
-            
-    def start_listening(self) -> None:
-        """Start background listening for speech"""
+            self.speech_worker.wait_ready()
+        except Exception as e:
+            raise AIError(f"Failed to initialize text-to-speech engine: {str(e)}")
+        
+    @property
+    def recognizer(self):
+        """The speech recognizer, created on first use"""
+        if self._recognizer is None:
+            with self._init_locks['stt']:
+                if self._recognizer is None:
+                    # Initialize STT recognizer with noise adjustment
+                    recognizer = sr.Recognizer()
+                    recognizer.dynamic_energy_threshold = True
+                    recognizer.energy_threshold = 4000
+                    self._recognizer = recognizer
+        return self._recognizer
+        
+    def warm_up(self, subsystems: Iterable[str] = SUBSYSTEMS) -> Dict[str, concurrent.futures.Future]:
+        """Create subsystems concurrently in background threads; each future fails with its creation error"""
+        loaders = {
+            'client': lambda: self.client,
+            'tts': self._start_tts,
+            'stt': lambda: self.recognizer,
+        }
+        subsystems = [name for name in subsystems if name not in self._warmups]
+        if subsystems:
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(subsystems), thread_name_prefix='ai-warmup'
+            )
+            for name in subsystems:
+                self._warmups[name] = executor.submit(loaders[name])
+            executor.shutdown(wait=False)
+        return dict(self._warmups)
+        
+    async def wait_ready(self, subsystem: str):
+        """Wait for a background warm-up of subsystem, if one was started"""
+        future = self._warmups.get(subsystem)
+        if future is not None and not future.done():
+            # Errors surface when the subsystem is used, not here
+            await asyncio.wait([asyncio.wrap_future(future)])
+        
+    def set_voice_properties(self, volume: float, rate: int):
+        """Apply voice settings, now if the TTS engine exists or when it is created"""
+        self.config.set('voice.volume', volume)
+        self.config.set('voice.rate', rate)
+        if self._speech_worker is not None:
+            self._speech_worker.set_properties(volume=volume, rate=rate)
+        
+    def _create_client(self, api_key: str) -> "openai.AsyncOpenAI":
+        """Create an async OpenAI client with a keep-alive connection pool"""
+        timeout = self.config.get('ai.timeout', 30.0)
+        http_client = openai.DefaultAsyncHttpxClient(
+            timeout=httpx.Timeout(timeout, connect=self.config.get('ai.connect_timeout', 5.0)),
+            limits=httpx.Limits(
+                max_connections=self.config.get('ai.max_connections', 10),
+                max_keepalive_connections=self.config.get('ai.max_connections', 10),
+                keepalive_expiry=self.config.get('ai.keepalive_expiry', 60.0)
+            )
+        )
+        # Retries are handled by _create_completion with jittered backoff
+        return openai.AsyncOpenAI(
+            api_key=api_key,
+            http_client=http_client,
+            timeout=timeout,
+            max_retries=0
+        )
+        
+    async def _create_completion(self, messages: List[Dict], stream: bool = False):
+        """Call the chat completions API, retrying transient errors with backoff"""
+        # Don't block the event loop on a client still being created in the background
+        await self.wait_ready('client')
+        max_retries = self.config.get('ai.max_retries', 3)
+        base_delay = self.config.get('ai.retry_base_delay', 0.5)
+        max_delay = self.config.get('ai.retry_max_delay', 8.0)
+        
+        attempt = 0
+        while True:
+            try:
+                return await self.client.chat.completions.create(
+                    model="gpt-4-turbo-preview",
+                    messages=messages,
+                    stream=stream
+                )
+            except (openai.RateLimitError, openai.APIConnectionError,
+                    openai.APITimeoutError, openai.InternalServerError):
+                if attempt >= max_retries:
+                    raise
+                # Full jitter: sleep a random time up to the exponential backoff cap
+                await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+                attempt += 1
+                
+    async def close(self):
+        """Release the API client, the speech worker and pools, and the history and cache stores"""
+        if self._speech_worker is not None:
+            # pyttsx3 hands every handler the same engine, so the next worker
+            # may only use it once this one has stopped
+            self._speech_worker.shutdown()
+            await asyncio.to_thread(self._speech_worker.join, 5)
+        if self._client is not None:
+            await self._client.close()
+        if self._sphinx_pool is not None:
+            self._sphinx_pool.shutdown(wait=False, cancel_futures=True)
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+        self.conversation_store.close()
+        self.search_index.close()
+        self.response_cache.close()
+        
+    def start_listening(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> SpeechQueue:
+        """Capture and recognize speech in the background; utterances arrive on the returned queue until listening stops"""
         if not self.is_listening:
             self.is_listening = True
-            threading.Thread(target=self._listen_continuously, daemon=True).start()
+            self.speech_queue = SpeechQueue(
+                loop or asyncio.get_event_loop(),
+                max_pending=self.config.get('voice.max_pending_utterances', 3),
+                merge_window=self.config.get('voice.merge_window', 2.0)
+            )
+            wake_word_factory = None
+            if self.config.get('voice.wake_word_enabled', False):
+                wake_word_factory = partial(
+                    WakeWordDetector,
+                    self.config.get('voice.wake_phrases', ["hey assistant"]),
+                    threshold=self.config.get('voice.wake_threshold', 1e-20)
+                )
+            self._utterances = queue.Queue()
+            self._microphone_stream = MicrophoneStream(
+                self._utterances.put,
+                self._calibration_file,
+                device_index=self.config.get('voice.device_index'),
+                wake_word_factory=wake_word_factory,
+                wake_timeout=self.config.get('voice.wake_timeout', 8.0),
+                muted=self._speaking_aloud,
+                ratio=self.config.get('voice.vad_ratio', 3.0),
+                hangover_ms=self.config.get('voice.vad_hangover_ms', 600),
+                max_utterance_seconds=self.config.get('voice.max_utterance_seconds', 15.0)
+            )
+            self._microphone_stream.start()
+            threading.Thread(
+                target=self._listen_continuously, args=(self._utterances, self.speech_queue), daemon=True
+            ).start()
+        return self.speech_queue
             
+    def _speaking_aloud(self) -> bool:
+        """Whether the microphone may be hearing the assistant's own voice"""
+        worker = self._speech_worker
+        return worker is not None and worker.is_speaking(self.config.get('voice.echo_tail_seconds', 0.5))
+        
     def stop_listening(self) -> None:
         """Stop background listening"""
         self.is_listening = False
+        if self._microphone_stream is not None:
+            self._microphone_stream.stop()
+            self._microphone_stream = None
+            self._utterances.put(None)
         
-    def _listen_continuously(self) -> None:
-        """Continuous listening function for background thread"""
-        while self.is_listening:
-            try:
-                text = self.speech_to_text()
-                if text:
-                    # Process the recognized text
-                    print(f"Recognized: {text}")
-                    # Here you could emit a signal or use a callback
-            except Exception as e:
-                print(f"Listening error: {e}")
-                continue
+    def _listen_continuously(self, utterances: queue.Queue, speech_queue: SpeechQueue) -> None:
+        """Recognize utterances from the microphone stream until listening stops"""
+        # Utterances are recognized concurrently and delivered in the order they were spoken
+        pipeline = RecognitionPipeline(
+            self.recognize, speech_queue.put_threadsafe,
+            max_workers=self.config.get('voice.recognition_workers', 3)
+        )
+        while True:
+            audio = utterances.get()
+            if audio is None:
+                break
+            pipeline.submit(audio)
+        pipeline.shutdown(wait=True)
+        speech_queue.close_threadsafe()
     
     def load_cache(self):
-        """Load response cache from file"""
-        try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'rb') as f:
-                    self.response_cache = pickle.load(f)
-            else:
-                self.response_cache = {}
-        except Exception:
-            self.response_cache = {}
+        """Open the persistent response cache"""
+        # Near-duplicate prompt index, built on first use
+        self.similarity_index: Optional[SimilarityIndex] = None
+        ttl_hours = self.config.get('cache.ttl_hours')
+        self.response_cache = ResponseCache(
+            self.cache_file,
+            max_entries=self.config.get('cache.max_entries', 1000),
+            max_size_bytes=int(self.config.get('cache.max_size_mb', 50) * 1024 * 1024),
+            ttl=ttl_hours * 3600 if ttl_hours else None,
+            on_evict=self._forget_cache_keys
+        )
+        
+        # Migrate the old pickle cache if one is left over
+        legacy_file = os.path.join(self.cache_dir, 'response_cache.pkl')
+        if os.path.exists(legacy_file):
+            self.response_cache.import_pickle(legacy_file)
             
-    def save_cache(self):
-        """Save response cache to file"""
-        try:
-            with open(self.cache_file, 'wb') as f:
-                pickle.dump(self.response_cache, f)
-        except Exception as e:
-            print(f"Error saving cache: {e}")
+    def _forget_cache_keys(self, keys: List[str]):
+        """Drop evicted cache entries from the similarity index"""
+        if self.similarity_index is not None:
+            for key in keys:
+                self.similarity_index.remove(key)
+                
+    def _find_similar_response(self, text: str, scope: str) -> Optional[str]:
+        """Return the cached response to a prompt similar enough to text in the same context, if any"""
+        if not self.config.get('cache.similarity_enabled', False):
+            return None
             
+        if self.similarity_index is None:
+            self.similarity_index = SimilarityIndex()
+            for key, prompt in self.response_cache.prompts():
+                # The context of a stored prompt is only known when it had none
+                if key == self.get_cache_key(prompt, []):
+                    self.similarity_index.add(prompt, key)
+                    
+        threshold = self.config.get('cache.similarity_threshold', 0.85)
+        while True:
+            match = self.similarity_index.lookup(text, threshold, scope)
+            if match is None:
+                return None
+            response = self.response_cache.get(match[0])
+            if response is not None:
+                return response
+            # Removed from the cache elsewhere; try the next best prompt
+            self.similarity_index.remove(match[0])
+            
+    @staticmethod
+    def _context_string(context: List[Dict]) -> str:
+        """The part of the conversation that distinguishes cache entries"""
+        if not context:
+            return ""
+        # Only include the last 2 exchanges for cache key
+        return json.dumps([
+            {'role': msg['role'], 'content': msg['content']}
+            for msg in context[-4:]
+        ])
+        
     def get_cache_key(self, text: str, context: List[Dict]) -> str:
         """Generate a cache key from input text and context"""
-        # Create a string that includes the input and relevant context
-        context_str = ""
-        if context:
-            # Only include the last 2 exchanges for cache key
-            recent_context = context[-4:]
-            context_str = json.dumps([
-                {'role': msg['role'], 'content': msg['content']}
-                for msg in recent_context
-            ])
-            
         # Combine input and context
-        combined = f"{text}|{context_str}"
+        combined = f"{text}|{self._context_string(context)}"
         
         # Generate hash
         return hashlib.md5(combined.encode()).hexdigest()
         
+    def _context_scope(self, context: List[Dict]) -> str:
+        """Similarity lookups only match prompts asked in the same context"""
+        context_str = self._context_string(context)
+        return hashlib.md5(context_str.encode()).hexdigest() if context_str else ""
+        
+    def _committed_history(self) -> List[Dict]:
+        """Conversation history without user messages still waiting for a response"""
+        if not self._inflight:
+            return self.conversation_history
+        pending = [user_message for _, user_message in self._inflight.values()]
+        return [
+            msg for msg in self.conversation_history
+            if not any(msg is user_message for user_message in pending)
+        ]
+        
+    def _use_cached_response(self, text: str, cache_key: str, scope: str) -> Optional[str]:
+        """Record a cached exchange in history and return the cached response, if any"""
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response is None:
+            cached_response = self._find_similar_response(text, scope)
+        if cached_response is None:
+            return None
+            
+        self._record_cached_exchange(text, cached_response)
+        return cached_response
+        
+    async def _await_inflight(self, text: str, cache_key: str) -> Optional[str]:
+        """Wait for an identical in-flight request and reuse its response, if any"""
+        if cache_key not in self._inflight:
+            return None
+            
+        future, _ = self._inflight[cache_key]
+        response_text = await asyncio.shield(future)
+        self._record_cached_exchange(text, response_text)
+        return response_text
+        
+    def _begin_flight(self, cache_key: str, user_message: Dict) -> asyncio.Future:
+        """Register an API request so identical prompts can wait for it"""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = (future, user_message)
+        return future
+        
+    def _end_flight(self, cache_key: str, future: asyncio.Future,
+                    response_text: Optional[str] = None, error: Optional[BaseException] = None):
+        """Unregister an API request and hand its outcome to any waiting callers"""
+        self._inflight.pop(cache_key, None)
+        if future.done():
+            return
+        if error is None:
+            future.set_result(response_text)
+            return
+        if not isinstance(error, Exception):
+            error = AIError("Request was cancelled")
+        future.set_exception(error)
+        # Mark the exception as retrieved in case nobody was waiting
+        future.exception()
+        
+    def _record_cached_exchange(self, text: str, cached_response: str):
+        """Add an exchange answered without an API call to the history"""
+        self._append_message({
+            "role": "user",
+            "content": text,
+            "timestamp": datetime.now().isoformat()
+        })
+        self._append_message({
+            "role": "assistant",
+            "content": cached_response,
+            "timestamp": datetime.now().isoformat(),
+            "cached": True
+        })
+        
+    def _append_message(self, message: Dict):
+        """Add a message to the in-memory history and the journal"""
+        self.conversation_history.append(message)
+        try:
+            self.conversation_store.append(message)
+        except Exception as e:
+            print(f"Error writing conversation journal: {e}")
+        
+    def _add_user_message(self, text: str) -> Dict:
+        """Add a user message to history and return it"""
+        user_message = {
+            "role": "user",
+            "content": text,
+            "timestamp": datetime.now().isoformat()
+        }
+        self._append_message(user_message)
+        return user_message
+        
+    def _prepare_messages(self) -> List[Dict]:
+        """Build the API message list from the conversation history within the token budget"""
+        messages, window_start = self.context_builder.build(
+            "You are a helpful AI assistant. Keep responses concise and friendly.",
+            self.conversation_history,
+            self.context_summary
+        )
+        
+        # Fold turns that no longer fit into the summary for later requests
+        if window_start > self._summarized_messages:
+            self._schedule_summary(window_start)
+        return messages
+        
+    def _schedule_summary(self, upto: int):
+        """Start summarizing history entries before index upto unless already running"""
+        if not self.config.get('ai.summarize_history', True):
+            return
+        if self._summary_task and not self._summary_task.done():
+            return
+        pending = self.conversation_history[self._summarized_messages:upto]
+        self._summary_task = asyncio.create_task(self._update_summary(pending))
+        
+    async def _update_summary(self, messages: List[Dict]):
+        """Fold messages into the rolling conversation summary"""
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = [
+            {"role": "system", "content": (
+                "Update the summary of a conversation between a user and an assistant. "
+                "Keep names, facts, preferences and open questions. Reply with the summary only."
+            )},
+            {"role": "user", "content": f"Current summary:\n{self.context_summary or '(none)'}\n\nNew messages:\n{transcript}"}
+        ]
+        try:
+            response = await self._create_completion(prompt)
+            if response.choices and response.choices[0].message.content:
+                self.context_summary = response.choices[0].message.content.strip()
+                self._summarized_messages += len(messages)
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
+        
+    def _finish_response(self, cache_key: str, text: str, response_text: str, scope: str):
+        """Cache a completed response and add it to history"""
+        # Cache the response
+        self.response_cache.set(cache_key, response_text, prompt=text)
+        if self.similarity_index is not None:
+            self.similarity_index.add(text, cache_key, scope)
+        
+        # Add assistant response to history
+        self._append_message({
+            "role": "assistant",
+            "content": response_text,
+            "timestamp": datetime.now().isoformat()
+        })
+        
+        # Trim history if too long, dropping only turns already in the summary
+        excess = len(self.conversation_history) - self.max_history_length * 2
+        if self.config.get('ai.summarize_history', True):
+            trimmed = min(excess, self._summarized_messages)
+        else:
+            trimmed = excess
+        if trimmed > 0:
+            self.conversation_history = self.conversation_history[trimmed:]
+            self._summarized_messages -= trimmed
+        
+        self.state = AIState.RESPONDING
+        
+    async def _analyze_state(self, text: str) -> AIState:
+        """Determine the emotional state of a response off the event loop"""
+        sentiment, uncertain = await self.sentiment_analyzer.analyze_async(text)
+        return self._get_state_from_sentiment(sentiment, uncertain)
+        
+    def _to_ai_error(self, error: Exception) -> AIError:
+        """Map an exception raised while processing input to an AIError"""
+        if isinstance(error, openai.AuthenticationError):
+            return AIError("Invalid API key. Please check your OpenAI API key in settings.")
+        if isinstance(error, openai.RateLimitError):
+            return AIError("API rate limit exceeded. Please try again later.")
+        self.state = AIState.ERROR
+        return AIError(f"Error processing input: {str(error)}")
+        
     async def process_text_input(self, text: str) -> Tuple[str, AIState]:
         """Process text input and return response and emotional state"""
         if not text.strip():
@@ -139,115 +560,141 @@ class AIHandler:
         try:
             self.state = AIState.PROCESSING
             
-            # Check cache first
-            cache_key = self.get_cache_key(text, self.conversation_history)
-            if cache_key in self.response_cache:
-                cached_response = self.response_cache[cache_key]
-                # Add to conversation history
-                self.conversation_history.append({
-                    "role": "user",
-                    "content": text,
-                    "timestamp": datetime.now().isoformat()
-                })
-                self.conversation_history.append({
-                    "role": "assistant",
-                    "content": cached_response,
-                    "timestamp": datetime.now().isoformat(),
-                    "cached": True
-                })
-                
+            # Check cache first, then identical requests already in flight
+            context = self._committed_history()
+            cache_key = self.get_cache_key(text, context)
+            scope = self._context_scope(context)
+            cached_response = self._use_cached_response(text, cache_key, scope)
+            if cached_response is None:
+                cached_response = await self._await_inflight(text, cache_key)
+            if cached_response is not None:
                 # Analyze sentiment and return
-                sentiment = TextBlob(cached_response).sentiment.polarity
-                state = self._get_state_from_sentiment(sentiment, cached_response)
+                state = await self._analyze_state(cached_response)
                 return cached_response, state
             
-            # Add user message to history
-            self.conversation_history.append({
-                "role": "user",
-                "content": text,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Prepare conversation context
-            messages = [
-                {"role": "system", "content": "You are a helpful AI assistant. Keep responses concise and friendly."}
-            ]
-            
-            # Add relevant history (last few exchanges)
-            history_start = max(0, len(self.conversation_history) - self.max_history_length)
-            for msg in self.conversation_history[history_start:]:
-                messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            # Call OpenAI API for response
-            response = await self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=messages
-            )
-            
-            if not response.choices:
-                raise AIError("No response received from AI")
+            user_message = self._add_user_message(text)
+            future = self._begin_flight(cache_key, user_message)
+            try:
+                messages = self._prepare_messages()
                 
-            response_text = response.choices[0].message.content
+                # Call OpenAI API for response
+                response = await self._create_completion(messages)
+                
+                if not response.choices:
+                    raise AIError("No response received from AI")
+                    
+                response_text = response.choices[0].message.content
+                self._finish_response(cache_key, text, response_text, scope)
+            except BaseException as e:
+                self._end_flight(cache_key, future, error=e)
+                raise
+            self._end_flight(cache_key, future, response_text)
             
-            # Cache the response
-            self.response_cache[cache_key] = response_text
-            self.save_cache()
+            # Analyze emotion in response
+            state = await self._analyze_state(response_text)
+            return response_text, state
             
-            # Add assistant response to history
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": response_text,
-                "timestamp": datetime.now().isoformat()
-            })
+        except Exception as e:
+            raise self._to_ai_error(e)
             
-            # Trim history if too long
-            if len(self.conversation_history) > self.max_history_length * 2:
-                self.conversation_history = self.conversation_history[-self.max_history_length * 2:]
+    async def process_text_input_stream(self, text: str) -> AsyncIterator[str]:
+        """Process text input and yield the response in chunks as it is generated"""
+        if not text.strip():
+            self.state = AIState.ERROR
+            yield "Please provide some input."
+            return
             
-            self.state = AIState.RESPONDING
+        try:
+            self.state = AIState.PROCESSING
             
-            # Analyze emotion in response
-            sentiment = TextBlob(response_text).sentiment.polarity
-            state = self._get_state_from_sentiment(sentiment, response_text)
+            # Cached and coalesced responses are delivered in a single chunk
+            context = self._committed_history()
+            cache_key = self.get_cache_key(text, context)
+            scope = self._context_scope(context)
+            cached_response = self._use_cached_response(text, cache_key, scope)
+            if cached_response is None:
+                cached_response = await self._await_inflight(text, cache_key)
+            if cached_response is not None:
+                self.state = await self._analyze_state(cached_response)
+                yield cached_response
+                return
             
-            return response_text, state
+            user_message = self._add_user_message(text)
+            future = self._begin_flight(cache_key, user_message)
+            try:
+                messages = self._prepare_messages()
+                
+                stream = await self._create_completion(messages, stream=True)
+                
+                self.state = AIState.RESPONDING
+                chunks = []
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+                
+                response_text = "".join(chunks)
+                if not response_text:
+                    raise AIError("No response received from AI")
+                    
+                self._finish_response(cache_key, text, response_text, scope)
+            except BaseException as e:
+                self._end_flight(cache_key, future, error=e)
+                raise
+            self._end_flight(cache_key, future, response_text)
+            self.state = await self._analyze_state(response_text)
             
-        except openai.AuthenticationError:
-            raise AIError("Invalid API key. Please check your OpenAI API key in settings.")
-        except openai.RateLimitError:
-            raise AIError("API rate limit exceeded. Please try again later.")
         except Exception as e:
-            self.state = AIState.ERROR
-            raise AIError(f"Error processing input: {str(e)}")
+            raise self._to_ai_error(e)
     
-    def _get_state_from_sentiment(self, sentiment: float, text: str) -> AIState:
-        """Determine AI state based on sentiment and text content"""
+    def _get_state_from_sentiment(self, sentiment: float, uncertain: bool) -> AIState:
+        """Determine AI state based on sentiment and whether the text sounds uncertain"""
         if sentiment > 0.3:
             return AIState.HAPPY
         elif sentiment < -0.3:
             return AIState.SAD
-        elif "?" in text or "not sure" in text.lower():
+        elif uncertain:
             return AIState.CONFUSED
         else:
             return AIState.IDLE
     
     def text_to_speech(self, text: str):
-        """Convert text to speech"""
+        """Queue text to be spoken sentence by sentence"""
         if not text:
             return
             
-        try:
-            self.tts_engine.say(text)
-            self.tts_engine.runAndWait()
-        except Exception as e:
-            raise AIError(f"Text-to-speech error: {str(e)}")
+        if self.speech_worker.error is not None:
+            raise AIError(f"Text-to-speech error: {str(self.speech_worker.error)}")
+        self.speech_worker.speak(text)
+        
+    def speak_stream(self, delta: str):
+        """Feed a chunk of a streamed response; complete sentences are spoken right away"""
+        self.speech_worker.feed(delta)
+        
+    def finish_speaking(self):
+        """Speak what is left of a streamed response"""
+        if self._speech_worker is not None:
+            self._speech_worker.flush()
+        
+    def stop_speaking(self):
+        """Interrupt current speech and drop anything queued"""
+        if self._speech_worker is not None:
+            self._speech_worker.interrupt()
     
     def speech_to_text(self) -> str:
-        """Convert speech to text with improved error handling"""
+        """Capture one phrase from the microphone and convert it to text"""
         try:
             with sr.Microphone() as source:
-                # Adjust for ambient noise
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                # Reuse the continuous listener's calibration instead of measuring noise every time
+                noise_floor = load_calibration(self._calibration_file)
+                if noise_floor is not None:
+                    self.recognizer.energy_threshold = max(100.0, noise_floor * self.config.get('voice.vad_ratio', 3.0))
+                elif not self._recognizer_calibrated:
+                    self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                    self._recognizer_calibrated = True
                 print("Listening...")
                 
                 try:
@@ -256,39 +703,82 @@ class AIHandler:
                 except sr.WaitTimeoutError:
                     return ""
                 
-                try:
-                    # Try with Google's speech recognition first
-                    text = self.recognizer.recognize_google(audio, language="ar-AR")
-                    return text
-                except sr.UnknownValueError:
-                    return ""
-                except sr.RequestError:
-                    # Fallback to offline recognition if available
-                    try:
-                        text = self.recognizer.recognize_sphinx(audio, language="ar")
-                        return text
-                    except:
-                        raise AIError("Speech recognition services unavailable")
-                        
+            return self.recognize(audio)
+        except AIError:
+            raise
         except Exception as e:
             raise AIError(f"Speech-to-text error: {str(e)}")
             
+    def recognize(self, audio) -> str:
+        """Convert captured audio to text, online first with an offline fallback"""
+        try:
+            # Try with Google's speech recognition first
+            return self.recognizer.recognize_google(audio, language="ar-AR")
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError:
+            # Fallback to offline recognition if available; pocketsphinx is
+            # CPU-bound, so it runs in worker processes
+            try:
+                if self._sphinx_pool is None:
+                    with self._init_locks['stt']:
+                        if self._sphinx_pool is None:
+                            self._sphinx_pool = spawn_process_pool(
+                                self.config.get('voice.sphinx_processes', 1)
+                            )
+                return self._sphinx_pool.submit(
+                    recognize_sphinx, audio.frame_data, audio.sample_rate, audio.sample_width, "ar"
+                ).result()
+            except Exception:
+                raise AIError("Speech recognition services unavailable")
+            
+    def search_history(self, query: str, limit: int = 20) -> List[Dict]:
+        """Search all journaled conversations, best matches first"""
+        try:
+            self.search_index.update()
+            return self.search_index.search(query, limit)
+        except Exception as e:
+            raise AIError(f"Failed to search conversation history: {str(e)}")
+            
+    def load_older_messages(self, count: int = 20, loaded: int = 0) -> List[Dict]:
+        """Page in up to count journaled messages older than the in-memory history and the loaded ones"""
+        end = len(self.conversation_store) - len(self.conversation_history) - loaded
+        return self.conversation_store.page(end - count, end)
+            
     def save_conversation_history(self, filepath: str):
-        """Save conversation history to a JSON file"""
+        """Save the full conversation from the journal to a JSON file"""
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.conversation_history, f, ensure_ascii=False, indent=2)
+                json.dump(self.conversation_store.page(0), f, ensure_ascii=False, indent=2)
         except Exception as e:
             raise AIError(f"Failed to save conversation history: {str(e)}")
             
     def load_conversation_history(self, filepath: str):
-        """Load conversation history from a JSON file"""
+        """Load conversation history from a JSON file as a new conversation"""
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
-                self.conversation_history = json.load(f)
+                messages = json.load(f)
+            self.clear_conversation_history()
+            for message in messages:
+                self.conversation_store.append(message)
+            self.conversation_history = messages[-self.max_history_length * 2:]
         except Exception as e:
             raise AIError(f"Failed to load conversation history: {str(e)}")
             
     def clear_conversation_history(self):
-        """Clear the conversation history"""
-        self.conversation_history = []
\ No newline at end of file
+        """Clear the conversation history, archiving its journal"""
+        self.conversation_history = []
+        # Index the rest of the journal before it is archived under a new name
+        self.search_index.update()
+        archive_path = self.conversation_store.rotate()
+        if archive_path:
+            self.search_index.rename_source(self.conversation_store.path, archive_path)
+        self._reset_summary()
+        
+    def _reset_summary(self):
+        """Discard the rolling summary after the history was replaced"""
+        if self._summary_task and not self._summary_task.done():
+            self._summary_task.cancel()
+        self._summary_task = None
+        self.context_summary = ""
+        self._summarized_messages = 0
\ No newline at end of file
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import wave
+from typing import Optional
+
+class AudioCache:
+    """Size-bounded on-disk cache of synthesized speech, one WAV file per text and voice settings"""
+
+    def __init__(self, directory: str, max_size_bytes: int = 100 * 1024 * 1024):
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(
+            entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith('.wav')
+        )
+
+    @staticmethod
+    def key(text: str, voice: Optional[str], rate: int, volume: float) -> str:
+        """Cache key for text spoken with the given voice settings"""
+        return hashlib.sha256(f"{voice}|{rate}|{volume}|{text}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the path of the cached audio for key, or None"""
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def render(self, engine, text: str, key: str) -> Optional[str]:
+        """Synthesize text to a WAV file with the engine and add it to the cache"""
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp.wav"
+        try:
+            engine.save_to_file(text, temp_path)
+            engine.runAndWait()
+            size = os.path.getsize(temp_path)
+            if not size:
+                raise OSError("engine produced no audio")
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Error caching speech audio: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+
+        with self._lock:
+            self._size += size
+            if self._size > self.max_size_bytes:
+                self._evict()
+        return path
+
+    def _evict(self):
+        """Delete least recently used files until the cache fits its size limit"""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.wav')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        self._size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._size <= self.max_size_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._size -= size
+            except OSError:
+                continue
+
+class WavPlayer:
+    """Blocking WAV playback with the platform's built-in player, stoppable from another thread"""
+
+    def __init__(self):
+        self._process: Optional[subprocess.Popen] = None
+        self._stopped = threading.Event()
+        self.command = None
+        if sys.platform == 'darwin':
+            self.command = ['afplay']
+        elif sys.platform != 'win32':
+            for command in (['paplay'], ['aplay', '-q'], ['ffplay', '-nodisp', '-autoexit', '-loglevel', 'quiet']):
+                if shutil.which(command[0]):
+                    self.command = command
+                    break
+
+    @property
+    def available(self) -> bool:
+        return sys.platform == 'win32' or self.command is not None
+
+    def play(self, path: str):
+        """Play a WAV file and return when it finished or was stopped"""
+        self._stopped.clear()
+        if sys.platform == 'win32':
+            import winsound
+            with wave.open(path, 'rb') as wav:
+                duration = wav.getnframes() / wav.getframerate()
+            winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+            self._stopped.wait(duration)
+            return
+        self._process = subprocess.Popen(
+            self.command + [path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self._process.wait()
+
+    def stop(self):
+        """Stop the file being played"""
+        self._stopped.set()
+        if sys.platform == 'win32':
+            import winsound
+            winsound.PlaySound(None, 0)
+        elif self._process is not None and self._process.poll() is None:
+            self._process.terminate()
@@ -0,0 +1,84 @@
+import asyncio
+import queue
+import threading
+from typing import AsyncIterator, Callable, Generic, Iterator, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+class BatchStream(Generic[T]):
+    """Base for searches whose worker threads hand batches of results to one consumer"""
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        # Set when the search failed; raised to the consumer after the last result
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._emit: Optional[Callable] = None
+
+    def _start(self, emit: Callable[[Optional[List[T]]], None]):
+        """Start producing; emit receives lists of results and finally None"""
+        raise NotImplementedError
+
+    def cancel(self):
+        raise NotImplementedError
+
+    def _fail(self, error: BaseException):
+        """Stop the search and report error to the consumer"""
+        with self._lock:
+            if self.error is None and not self._closed:
+                self.error = error
+        self.cancel()
+
+    def _close(self) -> bool:
+        """Tell the consumer that no more results will come, once; False if it already was"""
+        with self._lock:
+            if self._closed:
+                return False
+            self._closed = True
+        try:
+            self._emit(None)
+        except RuntimeError:
+            # The consuming event loop is already closed
+            pass
+        return True
+
+    def __iter__(self) -> Iterator[T]:
+        results: "queue.Queue" = queue.Queue()
+        self._start(results.put)
+        count = 0
+        try:
+            while True:
+                batch = results.get()
+                if batch is None:
+                    break
+                for result in batch:
+                    yield result
+                    count += 1
+                    if self.limit is not None and count >= self.limit:
+                        return
+        finally:
+            self.cancel()
+        if self.error is not None:
+            raise self.error
+
+    async def stream(self) -> AsyncIterator[T]:
+        """Yield results on the running event loop as batches arrive"""
+        loop = asyncio.get_running_loop()
+        results: asyncio.Queue = asyncio.Queue()
+        self._start(lambda batch: loop.call_soon_threadsafe(results.put_nowait, batch))
+        count = 0
+        try:
+            while True:
+                batch = await results.get()
+                if batch is None:
+                    break
+                for result in batch:
+                    yield result
+                    count += 1
+                    if self.limit is not None and count >= self.limit:
+                        return
+        finally:
+            self.cancel()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,144 @@
+import asyncio
+import locale
+import os
+import shlex
+from typing import AsyncIterator, Iterable, List, NamedTuple, Optional
+
+# Programs the assistant may run, always without a shell
+ALLOWED_COMMANDS = ('ls', 'dir', 'pwd', 'echo', 'date', 'time')
+# Commands that are cmd.exe builtins on Windows, and the characters cmd.exe would interpret
+WINDOWS_BUILTINS = ('dir', 'echo', 'date', 'time')
+WINDOWS_SPECIAL_CHARS = set('&|<>^%"()')
+READ_SIZE = 16384
+MAX_LINE_BYTES = 65536
+
+class OutputLine(NamedTuple):
+    stream: str  # 'stdout' or 'stderr'
+    text: str
+
+def parse_command(command: str, allowed: Iterable[str] = ALLOWED_COMMANDS) -> List[str]:
+    """Split command into program arguments, raising ValueError unless the program is allowed"""
+    args = shlex.split(command, posix=os.name != 'nt')
+    if not args or args[0] not in allowed:
+        raise ValueError("Command not allowed for security reasons")
+    if os.name == 'nt' and args[0] in WINDOWS_BUILTINS:
+        # Builtins only exist inside cmd.exe, which must not see any operator
+        if any(char in WINDOWS_SPECIAL_CHARS for arg in args for char in arg):
+            raise ValueError("Command not allowed for security reasons")
+        args = ['cmd', '/d', '/c'] + args
+    return args
+
+class CommandExecution:
+    """One running command whose stdout and stderr lines are streamed as they arrive"""
+
+    def __init__(self, args: List[str], semaphore: asyncio.Semaphore,
+                 timeout: Optional[float] = 30.0, max_output_bytes: int = 1024 * 1024,
+                 cwd: Optional[str] = None):
+        self.args = args
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self.cwd = cwd
+        self.returncode: Optional[int] = None
+        # Why the process was killed before it exited, if it was
+        self.timed_out = False
+        self.truncated = False
+        self._semaphore = semaphore
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._cancelled = asyncio.Event()
+
+    def cancel(self):
+        """Stop the command; the stream ends after the process was killed"""
+        self._cancelled.set()
+
+    async def _read(self, reader: asyncio.StreamReader, name: str, lines: asyncio.Queue):
+        """Split a pipe into lines; a line longer than MAX_LINE_BYTES is delivered in pieces"""
+        pending = b''
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                break
+            pending += data
+            *complete, pending = pending.split(b'\n')
+            for line in complete:
+                await lines.put((name, line + b'\n'))
+            while len(pending) >= MAX_LINE_BYTES:
+                piece, pending = pending[:MAX_LINE_BYTES], pending[MAX_LINE_BYTES:]
+                await lines.put((name, piece))
+        if pending:
+            await lines.put((name, pending))
+        await lines.put((name, None))
+
+    def _kill(self):
+        if self._process is not None and self._process.returncode is None:
+            try:
+                self._process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def stream(self) -> AsyncIterator[OutputLine]:
+        """Start the command once a slot is free and yield its output lines"""
+        async with self._semaphore:
+            if self._cancelled.is_set():
+                return
+            self._process = await asyncio.create_subprocess_exec(
+                *self.args, cwd=self.cwd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            lines: asyncio.Queue = asyncio.Queue(maxsize=256)
+            readers = [
+                asyncio.ensure_future(self._read(self._process.stdout, 'stdout', lines)),
+                asyncio.ensure_future(self._read(self._process.stderr, 'stderr', lines))
+            ]
+            cancelled = asyncio.ensure_future(self._cancelled.wait())
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout if self.timeout else None
+            encoding = locale.getpreferredencoding(False)
+            delivered, open_streams = 0, len(readers)
+            try:
+                while open_streams:
+                    get = asyncio.ensure_future(lines.get())
+                    remaining = deadline - loop.time() if deadline is not None else None
+                    done, _ = await asyncio.wait({get, cancelled}, timeout=remaining,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    if get not in done or self._cancelled.is_set():
+                        get.cancel()
+                        self.timed_out = not self._cancelled.is_set()
+                        return
+                    name, data = get.result()
+                    if data is None:
+                        open_streams -= 1
+                        continue
+                    delivered += len(data)
+                    if delivered > self.max_output_bytes:
+                        self.truncated = True
+                        return
+                    yield OutputLine(name, data.decode(encoding, errors='replace').rstrip('\r\n'))
+                self.returncode = await self._process.wait()
+            finally:
+                cancelled.cancel()
+                self._kill()
+                for reader in readers:
+                    reader.cancel()
+                await asyncio.gather(*readers, return_exceptions=True)
+                if self.returncode is None:
+                    self.returncode = await self._process.wait()
+
+class CommandRunner:
+    """Starts allowed commands without a shell, at most max_concurrent at a time"""
+
+    def __init__(self, max_concurrent: int = 2, timeout: Optional[float] = 30.0,
+                 max_output_bytes: int = 1024 * 1024, allowed: Iterable[str] = ALLOWED_COMMANDS):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self.allowed = tuple(allowed)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def run(self, command: str, cwd: Optional[str] = None) -> CommandExecution:
+        """A not yet started execution of command; raises ValueError if it is not allowed"""
+        args = parse_command(command, self.allowed)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return CommandExecution(args, self._semaphore, self.timeout, self.max_output_bytes, cwd)
@@ -0,0 +1,204 @@
+import concurrent.futures
+import fnmatch
+import mmap
+import os
+import re
+import threading
+import time
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from utils.process_pool import spawn_process_pool
+from .batch_stream import BatchStream
+from .file_index import IGNORED_DIRS
+from .file_walker import FileWalker
+
+# Bytes sniffed at the start of a file; a NUL byte there marks it as binary
+SNIFF_SIZE = 8192
+MAX_LINE_LENGTH = 300
+
+class ContentMatch(NamedTuple):
+    path: str
+    line_number: int
+    line: str
+    before: List[str]
+    after: List[str]
+
+def _decode_line(data: bytes) -> str:
+    line = data.rstrip(b'\r').decode('utf-8', errors='replace')
+    return line if len(line) <= MAX_LINE_LENGTH else line[:MAX_LINE_LENGTH] + '…'
+
+def _context_lines(mm: mmap.mmap, line_start: int, line_end: int, count: int):
+    """The count lines before and after the line spanning line_start..line_end"""
+    before = []
+    position = line_start - 1
+    while len(before) < count and position > 0:
+        start = mm.rfind(b'\n', 0, position) + 1
+        before.insert(0, _decode_line(mm[start:position]))
+        position = start - 1
+    after = []
+    position = line_end + 1
+    while len(after) < count and position < len(mm):
+        end = mm.find(b'\n', position)
+        end = len(mm) if end == -1 else end
+        after.append(_decode_line(mm[position:end]))
+        position = end + 1
+    return before, after
+
+def search_file(path: str, pattern: "re.Pattern", context: int = 0,
+                max_file_size: int = 10 * 1024 * 1024, max_matches: int = 100) -> List[ContentMatch]:
+    """Matching lines of one text file, read through a memory map"""
+    try:
+        size = os.path.getsize(path)
+        if size == 0 or size > max_file_size:
+            return []
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b'\0', 0, SNIFF_SIZE) != -1:
+                return []
+            matches = []
+            line_number, counted = 1, 0
+            line_end = -1
+            for match in pattern.finditer(mm):
+                if match.start() <= line_end:
+                    continue  # One result per line
+                line_start = mm.rfind(b'\n', 0, match.start()) + 1
+                line_end = mm.find(b'\n', match.start())
+                line_end = size if line_end == -1 else line_end
+                line_number += mm[counted:line_start].count(b'\n')
+                counted = line_start
+                before, after = _context_lines(mm, line_start, line_end, context) if context else ([], [])
+                matches.append(ContentMatch(path, line_number, _decode_line(mm[line_start:line_end]), before, after))
+                if len(matches) >= max_matches:
+                    break
+            return matches
+    except (OSError, ValueError):
+        return []
+
+def search_files(paths: List[str], pattern: bytes, flags: int, context: int,
+                 max_file_size: int, deadline: Optional[float]) -> Tuple[List[ContentMatch], int]:
+    """Search a batch of files in a worker process, until the deadline; also returns how many were searched"""
+    compiled = re.compile(pattern, flags)
+    matches = []
+    for searched, path in enumerate(paths):
+        if deadline is not None and time.time() > deadline:
+            return matches, searched
+        matches.extend(search_file(path, compiled, context, max_file_size))
+    return matches, len(paths)
+
+class ContentSearch(BatchStream[ContentMatch]):
+    """Parallel search for text inside the files of a directory tree, matched in worker processes"""
+
+    def __init__(self, root: str, query: str, regex: bool = False, ignore_case: bool = True,
+                 context: int = 1, limit: Optional[int] = 100, max_file_size: int = 10 * 1024 * 1024,
+                 timeout: Optional[float] = 30.0, include: Optional[Iterable[str]] = None,
+                 ignore: Iterable[str] = IGNORED_DIRS,
+                 executor: Optional[concurrent.futures.Executor] = None, max_batch: int = 64):
+        super().__init__(limit)
+        # Matching runs on UTF-8 bytes, so ignore_case folds ASCII letters only
+        pattern = query.encode('utf-8') if regex else re.escape(query.encode('utf-8'))
+        self.flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        # Invalid regular expressions fail here rather than in a worker
+        re.compile(pattern, self.flags)
+        self.pattern = pattern
+        self.root = root
+        self.context = context
+        self.max_file_size = max_file_size
+        self.timeout = timeout
+        self.include = list(include) if include else None
+        self.ignore = ignore
+        self.max_batch = max_batch
+        self.files_searched = 0
+        self.timed_out = False
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._walker: Optional[FileWalker] = None
+        self._cancelled = threading.Event()
+        self._futures = set()
+
+    def _included(self, name: str) -> bool:
+        return self.include is None or any(fnmatch.fnmatch(name, pattern) for pattern in self.include)
+
+    def cancel(self):
+        """Stop searching; batches already running in workers are abandoned"""
+        self._cancelled.set()
+        if self._walker is not None:
+            self._walker.cancel()
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+        self._close()
+
+    def _close(self) -> bool:
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        return super()._close()
+
+    def _start(self, emit: Callable[[Optional[List[ContentMatch]]], None]):
+        self._emit = emit
+        if self._executor is None:
+            self._executor = spawn_process_pool()
+        threading.Thread(target=self._dispatch, name='content-search', daemon=True).start()
+
+    def _dispatch(self):
+        """Walk the tree and hand out batches of files, small at first so results show early"""
+        deadline = time.time() + self.timeout if self.timeout else None
+        workers = getattr(self._executor, '_max_workers', os.cpu_count() or 1)
+        slots = threading.Semaphore(workers * 2)
+        self._walker = FileWalker(self.root, match=self._included, ignore=self.ignore)
+        batch, batch_size = [], 1
+        try:
+            for path in self._walker:
+                if self._cancelled.is_set():
+                    return
+                if deadline is not None and time.time() > deadline:
+                    self.timed_out = True
+                    break
+                batch.append(path)
+                if len(batch) >= batch_size:
+                    self._submit(batch, deadline, slots)
+                    batch, batch_size = [], min(batch_size * 2, self.max_batch)
+            if batch:
+                self._submit(batch, deadline, slots)
+            # Wait for the batches in flight before closing
+            for _ in range(workers * 2):
+                slots.acquire()
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._close()
+
+    def _submit(self, batch: List[str], deadline: Optional[float], slots: threading.Semaphore):
+        slots.acquire()
+        if self._cancelled.is_set():
+            slots.release()
+            return
+        try:
+            future = self._executor.submit(
+                search_files, batch, self.pattern, self.flags, self.context, self.max_file_size, deadline
+            )
+        except RuntimeError as e:
+            # Shut down by cancel(), or a broken pool
+            slots.release()
+            if not self._cancelled.is_set():
+                self._fail(e)
+            return
+        with self._lock:
+            self._futures.add(future)
+
+        def done(future):
+            error = None
+            with self._lock:
+                self._futures.discard(future)
+                if not future.cancelled():
+                    error = future.exception()
+                if error is None and not future.cancelled():
+                    matches, searched = future.result()
+                    self.files_searched += searched
+                    if searched < len(batch):
+                        self.timed_out = True
+                    if matches and not self._closed:
+                        self._emit(matches)
+            slots.release()
+            if error is not None:
+                self._fail(error)
+        future.add_done_callback(done)
@@ -0,0 +1,63 @@
+import math
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Words, runs of digits and single punctuation marks, roughly how BPE splits text
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d+|[^\w\s]")
+
+# Fixed overhead the chat format adds to every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+class ContextBuilder:
+    """Builds API message lists of the newest turns that fit within a token budget"""
+
+    def __init__(self, token_budget: int = 3000, model: str = "gpt-4-turbo-preview"):
+        self.token_budget = token_budget
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except Exception:
+                self._encoding = None
+        self.count_tokens = lru_cache(maxsize=4096)(self._count_tokens)
+
+    def _count_tokens(self, text: str) -> int:
+        """Count (or estimate) the tokens in text"""
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        # Long words are split into several tokens, about four characters each
+        return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PATTERN.findall(text))
+
+    def message_tokens(self, message: Dict) -> int:
+        """Tokens a single chat message costs in the prompt"""
+        return self.count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+    def build(self, system_prompt: str, history: List[Dict], summary: str = "") -> Tuple[List[Dict], int]:
+        """Return the messages to send and the index of the oldest history entry included"""
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation: {summary}"
+            })
+        remaining = self.token_budget - sum(self.message_tokens(msg) for msg in messages)
+
+        # Walk back from the newest turn, always keeping at least the latest one
+        start = len(history)
+        while start > 0:
+            cost = self.message_tokens(history[start - 1])
+            if cost > remaining and start < len(history):
+                break
+            remaining -= cost
+            start -= 1
+
+        messages.extend(
+            {"role": msg["role"], "content": msg["content"]} for msg in history[start:]
+        )
+        return messages, start
@@ -0,0 +1,113 @@
+import json
+import os
+import struct
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+_OFFSET = struct.Struct('<Q')
+
+class ConversationStore:
+    """Append-only JSONL journal of conversation messages, indexed by byte offset for paging"""
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._open()
+
+    def _open(self):
+        self._journal = open(self.path, 'a+b')
+        self._index = open(self.index_path, 'a+b')
+        self._recover()
+
+    def _recover(self):
+        """Bring the index in line with the journal after an unclean shutdown"""
+        self._journal.seek(0, os.SEEK_END)
+        journal_size = self._journal.tell()
+        self._index.seek(0, os.SEEK_END)
+        count = self._index.tell() // _OFFSET.size
+        self._index.truncate(count * _OFFSET.size)
+
+        # Drop index entries pointing past the end of the journal
+        while count and self._offset(count - 1) >= journal_size:
+            count -= 1
+        self._index.truncate(count * _OFFSET.size)
+
+        # Index complete lines written after the last indexed one
+        position = 0
+        if count:
+            self._journal.seek(self._offset(count - 1))
+            self._journal.readline()
+            position = self._journal.tell()
+        self._journal.seek(position)
+        self._index.seek(0, os.SEEK_END)
+        while True:
+            line = self._journal.readline()
+            if not line.endswith(b'\n'):
+                break
+            self._index.write(_OFFSET.pack(position))
+            position += len(line)
+
+        # Cut off a partially written last line
+        self._journal.truncate(position)
+        self._index.flush()
+        self._count = self._index.tell() // _OFFSET.size
+
+    def _offset(self, index: int) -> int:
+        self._index.seek(index * _OFFSET.size)
+        return _OFFSET.unpack(self._index.read(_OFFSET.size))[0]
+
+    def append(self, message: Dict):
+        """Write a message to the journal"""
+        line = (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            self._journal.seek(0, os.SEEK_END)
+            offset = self._journal.tell()
+            self._journal.write(line)
+            self._journal.flush()
+            self._index.seek(0, os.SEEK_END)
+            self._index.write(_OFFSET.pack(offset))
+            self._index.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+                os.fsync(self._index.fileno())
+            self._count += 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def page(self, start: int, end: Optional[int] = None) -> List[Dict]:
+        """Return messages with index in [start, end)"""
+        with self._lock:
+            end = self._count if end is None else min(end, self._count)
+            start = max(0, start)
+            if start >= end:
+                return []
+            self._journal.seek(self._offset(start))
+            return [json.loads(self._journal.readline()) for _ in range(end - start)]
+
+    def tail(self, count: int) -> List[Dict]:
+        """Return the last count messages"""
+        return self.page(len(self) - count)
+
+    def rotate(self) -> Optional[str]:
+        """Archive the current journal and start an empty one, returning the archive path"""
+        with self._lock:
+            self.close()
+            archive_path = None
+            if os.path.getsize(self.path):
+                base, ext = os.path.splitext(self.path)
+                archive_path = f"{base}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{ext}"
+                os.replace(self.path, archive_path)
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            self._open()
+            return archive_path
+
+    def close(self):
+        """Close the journal files"""
+        self._journal.close()
+        self._index.close()
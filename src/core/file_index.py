@@ -0,0 +1,326 @@
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Directories that are never worth indexing
+IGNORED_DIRS = frozenset({'.git', '.hg', '.svn', '__pycache__', 'node_modules', '.venv', '.tox', '.cache'})
+
+_MAGIC = b'AFIX'
+_VERSION = 1
+_HEADER = struct.Struct('<4sIdI')
+_SECTION = struct.Struct('<QQ')
+_SECTIONS = (
+    'root', 'dir_blob', 'dir_offsets', 'dir_mtimes',
+    'name_blob', 'name_offsets', 'lower_blob', 'lower_offsets', 'file_dirs',
+    'trigram_keys', 'trigram_offsets', 'postings'
+)
+_TYPES = {
+    'dir_offsets': 'Q', 'dir_mtimes': 'q', 'name_offsets': 'Q', 'lower_offsets': 'Q',
+    'file_dirs': 'I', 'trigram_keys': 'I', 'trigram_offsets': 'Q', 'postings': 'I'
+}
+
+def _trigram_key(trigram: str) -> int:
+    return zlib.crc32(trigram.encode('utf-8'))
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class _Snapshot:
+    """Read-only view of an index file through a memory map"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.mm)
+        magic, version, self.built_at, count = _HEADER.unpack_from(self.mm, 0)
+        if magic != _MAGIC or version != _VERSION or count != len(_SECTIONS):
+            self.mm.close()
+            raise ValueError(f"Not a file index: {path}")
+
+        self._view = memoryview(self.mm)
+        self.bounds = {}
+        self.views = {}
+        for number, name in enumerate(_SECTIONS):
+            offset, length = _SECTION.unpack_from(self.mm, _HEADER.size + number * _SECTION.size)
+            self.bounds[name] = (offset, offset + length)
+            view = self._view[offset:offset + length]
+            self.views[name] = view.cast(_TYPES[name]) if name in _TYPES else view
+        self.root = bytes(self.views['root']).decode('utf-8', 'surrogateescape')
+        self.file_count = len(self.views['file_dirs'])
+        self.dir_count = len(self.views['dir_mtimes'])
+
+    def _string(self, blob: str, offsets: str, index: int, trim: int = 0) -> str:
+        offsets = self.views[offsets]
+        return bytes(self.views[blob][offsets[index]:offsets[index + 1] - trim]).decode('utf-8', 'surrogateescape')
+
+    def directory(self, index: int) -> str:
+        return self._string('dir_blob', 'dir_offsets', index)
+
+    def name(self, index: int) -> str:
+        return self._string('name_blob', 'name_offsets', index)
+
+    def lower_name(self, index: int) -> str:
+        return self._string('lower_blob', 'lower_offsets', index, trim=1)
+
+    def path(self, index: int) -> str:
+        return os.path.join(self.directory(self.views['file_dirs'][index]), self.name(index))
+
+    def candidates(self, query: str) -> Iterable[int]:
+        """File ids that may contain query in their lowercased name"""
+        if len(query) < 3:
+            return self._scan(query)
+        keys = self.views['trigram_keys']
+        offsets = self.views['trigram_offsets']
+        smallest = None
+        for trigram in _trigrams(query):
+            key = _trigram_key(trigram)
+            position = bisect.bisect_left(keys, key)
+            if position == len(keys) or keys[position] != key:
+                return ()
+            span = (offsets[position], offsets[position + 1])
+            if smallest is None or span[1] - span[0] < smallest[1] - smallest[0]:
+                smallest = span
+        return self.views['postings'][smallest[0]:smallest[1]]
+
+    def _scan(self, query: str) -> Iterable[int]:
+        """Find short queries with a linear search of the name blob"""
+        needle = query.encode('utf-8', 'surrogateescape')
+        start, end = self.bounds['lower_blob']
+        offsets = self.views['lower_offsets']
+        position = self.mm.find(needle, start, end)
+        while position != -1:
+            index = bisect.bisect_right(offsets, position - start) - 1
+            yield index
+            position = self.mm.find(needle, start + offsets[index + 1], end)
+
+    def state(self) -> Dict[str, Tuple[int, List[str]]]:
+        """Decode the indexed tree as {directory: (mtime_ns, file names)}"""
+        names = defaultdict(list)
+        file_dirs = self.views['file_dirs']
+        for index in range(self.file_count):
+            names[file_dirs[index]].append(self.name(index))
+        mtimes = self.views['dir_mtimes']
+        return {self.directory(index): (mtimes[index], names[index]) for index in range(self.dir_count)}
+
+    def close(self):
+        for view in self.views.values():
+            view.release()
+        self._view.release()
+        self.mm.close()
+
+class FileIndex:
+    """Persistent trigram index of the file names under a directory tree"""
+
+    def __init__(self, root: str, index_path: str, ignored_dirs: Iterable[str] = IGNORED_DIRS):
+        self.root = os.path.abspath(root)
+        self.index_path = index_path
+        self.ignored_dirs = frozenset(ignored_dirs)
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._update_thread: Optional[threading.Thread] = None
+        self.checked_at: Optional[float] = None
+        self.last_update_seconds: Optional[float] = None
+        self.rescanned_dirs = 0
+        try:
+            snapshot = _Snapshot(index_path)
+            if snapshot.root == self.root:
+                self._snapshot = snapshot
+            else:
+                snapshot.close()
+        except (OSError, ValueError):
+            pass
+
+    @property
+    def is_built(self) -> bool:
+        return self._snapshot is not None
+
+    def search(self, query: str, limit: Optional[int] = None, under: Optional[str] = None) -> List[str]:
+        """Paths of indexed files whose name contains query, ignoring case"""
+        query = query.lower()
+        if under is not None:
+            under = os.path.abspath(under)
+        results = []
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or not query:
+                return results
+            for index in snapshot.candidates(query):
+                if query not in snapshot.lower_name(index):
+                    continue
+                path = snapshot.path(index)
+                if under is not None and not (path == under or path.startswith(under + os.sep)):
+                    continue
+                results.append(path)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    def update(self) -> bool:
+        """Bring the index up to date with the file system; return whether it changed"""
+        with self._update_lock:
+            started = time.time()
+            with self._lock:
+                previous = self._snapshot.state() if self._snapshot is not None else {}
+            directories, self.rescanned_dirs = self._scan(previous)
+            changed = self._snapshot is None or self.rescanned_dirs > 0 or len(directories) != len(previous)
+            if changed:
+                temp_path = f"{self.index_path}.tmp"
+                self._write(temp_path, directories, started)
+                with self._lock:
+                    # The old map must be closed before the file can be replaced on Windows
+                    if self._snapshot is not None:
+                        self._snapshot.close()
+                        self._snapshot = None
+                    os.replace(temp_path, self.index_path)
+                    self._snapshot = _Snapshot(self.index_path)
+            self.checked_at = time.time()
+            self.last_update_seconds = self.checked_at - started
+            return changed
+
+    def update_in_background(self) -> threading.Thread:
+        """Start update() in a daemon thread unless one is already running"""
+        with self._lock:
+            if self._update_thread is None or not self._update_thread.is_alive():
+                self._update_thread = threading.Thread(target=self._update_safely, name='file-index', daemon=True)
+                self._update_thread.start()
+            return self._update_thread
+
+    def _update_safely(self):
+        try:
+            self.update()
+        except Exception as e:
+            print(f"Error updating file index: {e}")
+
+    def _scan(self, previous: Dict[str, Tuple[int, List[str]]]):
+        """Walk the tree, reusing the listing of every directory whose mtime is unchanged"""
+        children = defaultdict(list)
+        for directory in previous:
+            if directory != self.root:
+                children[os.path.dirname(directory)].append(directory)
+
+        directories = {}
+        rescanned = 0
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            old = previous.get(directory)
+            if old is not None and old[0] == mtime:
+                directories[directory] = old
+                stack.extend(children.get(directory, ()))
+                continue
+
+            rescanned += 1
+            names = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.name not in self.ignored_dirs:
+                                    stack.append(entry.path)
+                            else:
+                                names.append(entry.name)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            directories[directory] = (mtime, names)
+        return directories, rescanned
+
+    def _write(self, path: str, directories: Dict[str, Tuple[int, List[str]]], built_at: float):
+        """Serialize the tree and its trigram postings into an index file"""
+        dir_blob, dir_offsets, dir_mtimes = bytearray(), array('Q', [0]), array('q')
+        name_blob, name_offsets = bytearray(), array('Q', [0])
+        lower_blob, lower_offsets = bytearray(), array('Q', [0])
+        file_dirs = array('I')
+        postings_by_trigram = defaultdict(list)
+
+        for dir_index, (directory, (mtime, names)) in enumerate(directories.items()):
+            dir_blob += directory.encode('utf-8', 'surrogateescape')
+            dir_offsets.append(len(dir_blob))
+            dir_mtimes.append(mtime)
+            for name in names:
+                file_id = len(file_dirs)
+                lowered = name.lower()
+                name_blob += name.encode('utf-8', 'surrogateescape')
+                name_offsets.append(len(name_blob))
+                lower_blob += lowered.encode('utf-8', 'surrogateescape') + b'\0'
+                lower_offsets.append(len(lower_blob))
+                file_dirs.append(dir_index)
+                for trigram in _trigrams(lowered):
+                    postings_by_trigram[trigram].append(file_id)
+
+        # Distinct trigrams can share a hash; their postings are merged
+        postings_by_key = {}
+        for trigram, ids in postings_by_trigram.items():
+            key = _trigram_key(trigram)
+            if key in postings_by_key:
+                postings_by_key[key] = sorted(set(postings_by_key[key]) | set(ids))
+            else:
+                postings_by_key[key] = ids
+        trigram_keys, trigram_offsets, postings = array('I'), array('Q', [0]), array('I')
+        for key in sorted(postings_by_key):
+            trigram_keys.append(key)
+            postings.extend(postings_by_key[key])
+            trigram_offsets.append(len(postings))
+
+        sections = {
+            'root': self.root.encode('utf-8', 'surrogateescape'),
+            'dir_blob': bytes(dir_blob), 'dir_offsets': dir_offsets, 'dir_mtimes': dir_mtimes,
+            'name_blob': bytes(name_blob), 'name_offsets': name_offsets,
+            'lower_blob': bytes(lower_blob), 'lower_offsets': lower_offsets, 'file_dirs': file_dirs,
+            'trigram_keys': trigram_keys, 'trigram_offsets': trigram_offsets, 'postings': postings
+        }
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            table_end = _HEADER.size + len(_SECTIONS) * _SECTION.size
+            f.write(_HEADER.pack(_MAGIC, _VERSION, built_at, len(_SECTIONS)))
+            offset = table_end
+            layout = []
+            for name in _SECTIONS:
+                data = sections[name]
+                data = data.tobytes() if isinstance(data, array) else data
+                offset += -offset % 8  # Keep typed sections aligned
+                layout.append((offset, data))
+                f.write(_SECTION.pack(offset, len(data)))
+                offset += len(data)
+            for offset, data in layout:
+                f.seek(offset)
+                f.write(data)
+
+    def stats(self) -> Dict:
+        """Size and freshness of the index"""
+        snapshot = self._snapshot
+        now = time.time()
+        return {
+            "root": self.root,
+            "built": snapshot is not None,
+            "files": snapshot.file_count if snapshot else 0,
+            "directories": snapshot.dir_count if snapshot else 0,
+            "index_bytes": snapshot.size if snapshot else 0,
+            "built_at": snapshot.built_at if snapshot else None,
+            "age_seconds": now - snapshot.built_at if snapshot else None,
+            "checked_at": self.checked_at,
+            "seconds_since_check": now - self.checked_at if self.checked_at else None,
+            "last_update_seconds": self.last_update_seconds,
+            "rescanned_dirs": self.rescanned_dirs,
+            "updating": self._update_thread is not None and self._update_thread.is_alive()
+        }
+
+    def close(self):
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot.close()
+                self._snapshot = None
@@ -0,0 +1,98 @@
+import concurrent.futures
+import fnmatch
+import os
+import re
+import threading
+from typing import Callable, Iterable, List, Optional
+
+from .batch_stream import BatchStream
+from .file_index import IGNORED_DIRS
+
+class FileWalker(BatchStream[str]):
+    """Parallel, cancellable directory walk that streams matching files"""
+
+    def __init__(self, root: str, match: Optional[Callable[[str], bool]] = None,
+                 limit: Optional[int] = None, max_depth: Optional[int] = None,
+                 ignore: Iterable[str] = IGNORED_DIRS, max_workers: int = 8):
+        super().__init__(limit)
+        self.root = root
+        self.match = match
+        self.max_depth = max_depth
+        # Plain names are matched with a set lookup, glob patterns with one regex
+        ignore = list(ignore)
+        self._ignored_names = {pattern for pattern in ignore if not any(c in pattern for c in '*?[')}
+        globs = [fnmatch.translate(pattern) for pattern in ignore if pattern not in self._ignored_names]
+        self._ignored_pattern = re.compile('|'.join(globs)) if globs else None
+        self.max_workers = max_workers
+        self.scanned_dirs = 0
+        self._cancelled = threading.Event()
+        self._pending = 0
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def cancel(self):
+        """Stop the walk; directories being listed finish, nothing new starts"""
+        self._cancelled.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._close()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _ignored(self, name: str) -> bool:
+        if name in self._ignored_names:
+            return True
+        return self._ignored_pattern is not None and self._ignored_pattern.match(name) is not None
+
+    def _start(self, emit: Callable[[Optional[List[str]]], None]):
+        self._emit = emit
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix='file-walker')
+        self._pending = 1
+        self._executor.submit(self._scan, self.root, 0)
+
+    def _submit(self, path: str, depth: int):
+        with self._lock:
+            self._pending += 1
+        try:
+            self._executor.submit(self._scan, path, depth)
+        except RuntimeError:
+            # The pool was shut down by cancel()
+            self._finish_one()
+
+    def _finish_one(self):
+        with self._lock:
+            self._pending -= 1
+            done = self._pending == 0
+        if done:
+            self._executor.shutdown(wait=False)
+            self._close()
+
+    def _scan(self, directory: str, depth: int):
+        try:
+            if self.cancelled:
+                return
+            matches = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if self._ignored(entry.name):
+                            continue
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if is_dir:
+                            if self.max_depth is None or depth < self.max_depth:
+                                self._submit(entry.path, depth + 1)
+                        elif self.match is None or self.match(entry.name):
+                            matches.append(entry.path)
+            except OSError:
+                return
+            with self._lock:
+                self.scanned_dirs += 1
+                if not matches or self._closed:
+                    return
+                self._emit(matches)
+        finally:
+            self._finish_one()
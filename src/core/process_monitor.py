@@ -0,0 +1,88 @@
+import heapq
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import psutil
+
+class ProcessSample(NamedTuple):
+    pid: int
+    name: str
+    cpu_percent: float
+    memory_bytes: int
+    memory_percent: float
+    io_bytes_per_sec: float
+
+class ProcessMonitor:
+    """Top processes by CPU, memory or disk I/O, from incremental samples"""
+
+    KEYS = {
+        'cpu': lambda sample: sample.cpu_percent,
+        'memory': lambda sample: sample.memory_bytes,
+        'io': lambda sample: sample.io_bytes_per_sec
+    }
+
+    def __init__(self, min_interval: float = 1.0, max_age: float = 5.0):
+        self.min_interval = min_interval
+        # Rates over a longer gap than this would not show current usage
+        self.max_age = max_age
+        self.attrs = ['pid', 'name', 'create_time', 'cpu_times', 'memory_info']
+        # Not available on macOS
+        if hasattr(psutil.Process, 'io_counters'):
+            self.attrs.append('io_counters')
+        # (pid, create time) -> (cpu seconds, io bytes) at the last sample
+        self._state: Dict[Tuple[int, float], Tuple[float, int]] = {}
+        self._sampled_at: Optional[float] = None
+        self._samples: List[ProcessSample] = []
+        self._lock = threading.Lock()
+
+    @property
+    def baseline_expired(self) -> bool:
+        """Whether the next rates need a new baseline sample first"""
+        sampled_at = self._sampled_at
+        return sampled_at is None or time.monotonic() - sampled_at > self.max_age
+
+    def sample(self) -> List[ProcessSample]:
+        """Read every process once; rates are zero for processes seen for the first time"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._sampled_at if self._sampled_at is not None else None
+            memory_total = psutil.virtual_memory().total
+            state, samples = {}, []
+            for process in psutil.process_iter(self.attrs, ad_value=None):
+                info = process.info
+                if info['cpu_times'] is None:
+                    continue
+                key = (info['pid'], info['create_time'])
+                cpu = info['cpu_times'].user + info['cpu_times'].system
+                io = info.get('io_counters')
+                io = io.read_bytes + io.write_bytes if io is not None else 0
+                state[key] = (cpu, io)
+                previous = self._state.get(key)
+                if previous is not None and elapsed:
+                    cpu_percent = max(0.0, (cpu - previous[0]) / elapsed * 100)
+                    io_rate = max(0.0, (io - previous[1]) / elapsed)
+                else:
+                    cpu_percent, io_rate = 0.0, 0.0
+                memory = info['memory_info'].rss if info['memory_info'] is not None else 0
+                samples.append(ProcessSample(
+                    info['pid'], info['name'] or '', cpu_percent, memory,
+                    memory / memory_total * 100, io_rate
+                ))
+            self._state, self._samples, self._sampled_at = state, samples, now
+            return samples
+
+    def top(self, n: int = 10, by: str = 'cpu') -> List[ProcessSample]:
+        """The n processes with the highest cpu, memory or io, sampling again if the last sample is stale"""
+        key = self.KEYS[by]
+        if self.baseline_expired:
+            self.sample()
+            time.sleep(self.min_interval)
+            samples = self.sample()
+        else:
+            with self._lock:
+                fresh = time.monotonic() - self._sampled_at < self.min_interval
+                samples = self._samples
+            if not fresh:
+                samples = self.sample()
+        return heapq.nlargest(n, samples, key=key)
@@ -0,0 +1,57 @@
+import concurrent.futures
+import threading
+from functools import partial
+from typing import Callable, Dict
+
+def recognize_sphinx(frame_data: bytes, sample_rate: int, sample_width: int, language: str) -> str:
+    """Decode PCM audio offline with pocketsphinx; runs in a worker process"""
+    import speech_recognition as sr
+    audio = sr.AudioData(frame_data, sample_rate, sample_width)
+    try:
+        return sr.Recognizer().recognize_sphinx(audio, language=language)
+    except sr.UnknownValueError:
+        return ""
+
+class RecognitionPipeline:
+    """Recognizes captured audio segments concurrently, delivering text in capture order"""
+
+    def __init__(self, recognize: Callable[..., str], on_result: Callable[[str], None],
+                 max_workers: int = 3, max_pending: int = 6):
+        self._recognize = recognize
+        self._on_result = on_result
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='recognizer')
+        self._slots = threading.BoundedSemaphore(max(max_pending, max_workers))
+        self._lock = threading.Lock()
+        self._next_sequence = 0
+        self._next_delivery = 0
+        self._finished: Dict[int, str] = {}
+
+    def submit(self, audio):
+        """Queue an audio segment for recognition"""
+        self._slots.acquire()
+        with self._lock:
+            sequence = self._next_sequence
+            self._next_sequence += 1
+        future = self._executor.submit(self._run, audio)
+        future.add_done_callback(partial(self._complete, sequence))
+
+    def _run(self, audio) -> str:
+        try:
+            return self._recognize(audio)
+        except Exception as e:
+            print(f"Speech recognition error: {e}")
+            return ""
+
+    def _complete(self, sequence: int, future: concurrent.futures.Future):
+        self._slots.release()
+        with self._lock:
+            self._finished[sequence] = future.result()
+            while self._next_delivery in self._finished:
+                text = self._finished.pop(self._next_delivery)
+                self._next_delivery += 1
+                if text:
+                    self._on_result(text)
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting segments; with wait, deliver everything already submitted first"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,93 @@
+import bisect
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+import psutil
+
+class ResourceSampler(threading.Thread):
+    """Background sampler of system resource usage into fixed-size ring buffers"""
+
+    METRICS = ('cpu_percent', 'memory_percent', 'disk_percent', 'net_sent_per_sec', 'net_recv_per_sec')
+
+    def __init__(self, interval: float = 1.0, capacity: int = 3600, disk_path: str = '/'):
+        super().__init__(name='resource-sampler', daemon=True)
+        self.interval = interval
+        self.capacity = capacity
+        self.disk_path = disk_path
+        self._times = array('d', bytes(8 * capacity))
+        self._buffers = {name: array('d', bytes(8 * capacity)) for name in self.METRICS}
+        self._count = 0
+        self._latest: Dict[str, float] = {}
+        self._stopped = threading.Event()
+
+    def run(self):
+        psutil.cpu_percent()  # The first reading only sets the baseline
+        network = psutil.net_io_counters()
+        last_time = time.time()
+        while not self._stopped.wait(self.interval):
+            now = time.time()
+            try:
+                current_network = psutil.net_io_counters()
+                elapsed = max(now - last_time, 1e-6)
+                sample = {
+                    'cpu_percent': psutil.cpu_percent(),
+                    'memory_percent': psutil.virtual_memory().percent,
+                    'disk_percent': psutil.disk_usage(self.disk_path).percent,
+                    'net_sent_per_sec': (current_network.bytes_sent - network.bytes_sent) / elapsed,
+                    'net_recv_per_sec': (current_network.bytes_recv - network.bytes_recv) / elapsed
+                }
+                network, last_time = current_network, now
+            except Exception as e:
+                print(f"Error sampling resource usage: {e}")
+                continue
+            self.record(sample, now)
+
+    def record(self, sample: Dict[str, float], timestamp: float):
+        """Append one sample; only the sampling thread may call this"""
+        position = self._count % self.capacity
+        self._times[position] = timestamp
+        for name in self.METRICS:
+            self._buffers[name][position] = sample[name]
+        self._count += 1
+        self._latest = dict(sample, timestamp=timestamp)
+
+    def stop(self):
+        self._stopped.set()
+
+    def snapshot(self) -> Dict[str, float]:
+        """The most recent sample, or an empty dict before the first one"""
+        return self._latest
+
+    def window(self, metric: str, seconds: Optional[float] = None) -> List[float]:
+        """Samples of metric from the last seconds (all retained samples by default), oldest first"""
+        count = min(self._count, self.capacity)
+        end = self._count % self.capacity
+        buffer, times = self._buffers[metric], self._times
+        if count < self.capacity:
+            values, stamps = buffer[:count], times[:count]
+        else:
+            values, stamps = buffer[end:] + buffer[:end], times[end:] + times[:end]
+        if seconds is None:
+            return values.tolist()
+        return values[bisect.bisect_left(stamps, time.time() - seconds):].tolist()
+
+    def stats(self, metric: str, seconds: Optional[float] = None) -> Dict[str, float]:
+        """Average, median, 95th percentile, minimum and maximum of metric over a window"""
+        values = sorted(self.window(metric, seconds))
+        if not values:
+            return {}
+        return {
+            'samples': len(values),
+            'average': sum(values) / len(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'min': values[0],
+            'max': values[-1]
+        }
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
@@ -0,0 +1,185 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+class ResponseCache:
+    """Bounded, persistent LRU cache of AI responses backed by SQLite"""
+
+    EVICT_INTERVAL = 32  # Check limits every N writes
+
+    def __init__(self, db_path: str, max_entries: int = 1000,
+                 max_size_bytes: int = 50 * 1024 * 1024, ttl: Optional[float] = None,
+                 on_evict: Optional[Callable[[List[str]], None]] = None):
+        self.db_path = db_path
+        # Called with the keys this instance removed
+        self.on_evict = on_evict
+        self.max_entries = max_entries
+        self.max_size_bytes = max_size_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Key -> access time not yet written to the database
+        self._accessed: Dict[str, float] = {}
+
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                prompt TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            expired = self.ttl is not None and now - created_at > self.ttl
+            if expired:
+                self._accessed.pop(key, None)
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+            else:
+                self._accessed[key] = now
+        if expired:
+            self._evicted([key])
+            return None
+        return response
+
+    def _flush_accessed(self):
+        """Write the pending access times; the caller holds the lock and commits"""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def _evicted(self, keys: List[str]):
+        if keys and self.on_evict is not None:
+            self.on_evict(keys)
+
+    def set(self, key: str, response: str, prompt: Optional[str] = None):
+        """Store a response, evicting old entries when limits are exceeded"""
+        now = time.time()
+        with self._lock:
+            self._accessed.pop(key, None)
+            self._flush_accessed()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, prompt, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, prompt, len(response.encode('utf-8')), now, now)
+            )
+            self._conn.commit()
+            self._writes += 1
+            should_evict = self._writes % self.EVICT_INTERVAL == 0
+        if should_evict:
+            self.evict()
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def prompts(self) -> Iterator[Tuple[str, str]]:
+        """Yield (key, prompt) for every entry that recorded its prompt"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, prompt FROM responses WHERE prompt IS NOT NULL"
+            ).fetchall()
+        yield from rows
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until within limits"""
+        evicted = []
+        with self._lock:
+            self._flush_accessed()
+            if self.ttl is not None:
+                cutoff = time.time() - self.ttl
+                evicted.extend(key for key, in self._conn.execute(
+                    "SELECT key FROM responses WHERE created_at < ?", (cutoff,)
+                ))
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+            count, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+
+            excess = max(0, count - self.max_entries)
+            if excess:
+                keys = [key for key, in self._conn.execute(
+                    "SELECT key FROM responses ORDER BY accessed_at LIMIT ?", (excess,)
+                )]
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+                evicted.extend(keys)
+                total_size = self._conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()[0]
+
+            while total_size > self.max_size_bytes:
+                row = self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+                evicted.append(row[0])
+                total_size -= row[1]
+            self._conn.commit()
+        self._evicted(evicted)
+
+    def import_pickle(self, pickle_path: str):
+        """Import entries from a legacy pickled dict cache and remove the file"""
+        try:
+            with open(pickle_path, 'rb') as f:
+                legacy = pickle.load(f)
+            now = time.time()
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO responses (key, response, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (key, value, len(value.encode('utf-8')), now, now)
+                        for key, value in legacy.items() if isinstance(value, str)
+                    ]
+                )
+                self._conn.commit()
+            os.remove(pickle_path)
+        except Exception as e:
+            print(f"Error importing legacy cache: {e}")
+        self.evict()
+
+    def clear(self):
+        """Remove all cached responses"""
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        """Write pending access times and close the underlying database connection"""
+        with self._lock:
+            if self._accessed:
+                self._flush_accessed()
+                self._conn.commit()
+            self._conn.close()
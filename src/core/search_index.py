@@ -0,0 +1,129 @@
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List
+
+from utils.text import normalize_token, tokenize
+
+class ConversationSearchIndex:
+    """Incremental full-text index over journaled conversations"""
+
+    SNIPPET_WORDS = 12
+
+    def __init__(self, db_path: str, journal_pattern: str):
+        self.journal_pattern = journal_pattern
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages USING fts5(
+                body, content UNINDEXED, role UNINDEXED, timestamp UNINDEXED, source UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        """)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, offset INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def update(self):
+        """Index messages appended to the journals since the last update"""
+        with self._lock:
+            offsets = dict(self._conn.execute("SELECT path, offset FROM sources"))
+            for path in glob.glob(self.journal_pattern):
+                offset = offsets.get(path, 0)
+                size = os.path.getsize(path)
+                if size == offset:
+                    continue
+                if size < offset:
+                    # The file was replaced; index it from scratch
+                    self._conn.execute("DELETE FROM messages WHERE source = ?", (path,))
+                    offset = 0
+                offset = self._index_file(path, offset)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sources (path, offset) VALUES (?, ?)", (path, offset)
+                )
+            self._conn.commit()
+
+    def _index_file(self, path: str, offset: int) -> int:
+        """Index complete lines of a journal from offset and return the new offset"""
+        rows = []
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                content = message.get("content", "")
+                if message.get("role") not in ("user", "assistant") or not content:
+                    continue
+                rows.append((
+                    " ".join(tokenize(content)), content,
+                    message["role"], message.get("timestamp", ""), path
+                ))
+        self._conn.executemany(
+            "INSERT INTO messages (body, content, role, timestamp, source) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        return offset
+
+    def rename_source(self, old_path: str, new_path: str):
+        """Keep indexed messages attached to a journal that was renamed"""
+        with self._lock:
+            self._conn.execute("UPDATE sources SET path = ? WHERE path = ?", (new_path, old_path))
+            self._conn.execute("UPDATE messages SET source = ? WHERE source = ?", (new_path, old_path))
+            self._conn.commit()
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """Return the best matching messages with a snippet around the first hit"""
+        terms = [term for term in tokenize(query) if term]
+        if not terms:
+            return []
+        # Quote each term and allow prefix matches; all terms must occur
+        match = " AND ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content, role, timestamp, source, bm25(messages) FROM messages "
+                "WHERE messages MATCH ? ORDER BY bm25(messages) LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        return [
+            {
+                "content": content,
+                "role": role,
+                "timestamp": timestamp,
+                "source": source,
+                "score": -score,
+                "snippet": self._snippet(content, terms)
+            }
+            for content, role, timestamp, source, score in rows
+        ]
+
+    def _snippet(self, content: str, terms: List[str]) -> str:
+        """Cut a window of words around the first word matching a query term"""
+        words = list(re.finditer(r"\w+", content))
+        hit = next(
+            (i for i, word in enumerate(words)
+             if any(normalize_token(word.group()).startswith(term) for term in terms)),
+            0
+        )
+        first = max(0, hit - self.SNIPPET_WORDS // 2)
+        last = min(len(words), first + self.SNIPPET_WORDS) - 1
+        if not words:
+            return content[:80]
+        snippet = content[words[first].start():words[last].end()]
+        prefix = "…" if first > 0 else ""
+        suffix = "…" if last < len(words) - 1 else ""
+        return f"{prefix}{snippet}{suffix}"
+
+    def close(self):
+        """Close the index database"""
+        with self._lock:
+            self._conn.close()
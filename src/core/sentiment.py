@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from utils.text import normalize_token, tokenize
+
+# Word polarities on TextBlob's -1..1 scale
+ENGLISH_LEXICON = {
+    "good": 0.7, "great": 0.8, "excellent": 1.0, "amazing": 0.6, "awesome": 1.0,
+    "wonderful": 1.0, "fantastic": 0.4, "nice": 0.6, "happy": 0.8, "glad": 0.5,
+    "love": 0.5, "like": 0.2, "enjoy": 0.4, "best": 1.0, "better": 0.5,
+    "perfect": 1.0, "beautiful": 0.85, "fun": 0.3, "thanks": 0.2, "thank": 0.2,
+    "welcome": 0.8, "pleased": 0.5, "delighted": 0.7, "success": 0.3,
+    "successful": 0.75, "easy": 0.43, "helpful": 0.5, "correct": 0.3, "sure": 0.5,
+    "congratulations": 0.8, "fine": 0.4, "exciting": 0.3, "cool": 0.35, "brilliant": 0.9,
+    "bad": -0.7, "terrible": -1.0, "awful": -1.0, "horrible": -1.0, "worst": -1.0,
+    "worse": -0.4, "sad": -0.5, "unhappy": -0.6, "hate": -0.8, "sorry": -0.5,
+    "unfortunately": -0.5, "wrong": -0.5, "error": -0.4, "fail": -0.5, "failed": -0.5,
+    "failure": -0.5, "problem": -0.3, "difficult": -0.5, "hard": -0.3, "poor": -0.4,
+    "annoying": -0.8, "angry": -0.5, "disappointed": -0.75, "broken": -0.4, "impossible": -0.67,
+    "boring": -1.0, "ugly": -0.7, "painful": -0.7, "stupid": -0.8, "useless": -0.5,
+}
+
+ARABIC_LEXICON = {
+    "جيد": 0.7, "جميل": 0.85, "رائع": 1.0, "ممتاز": 1.0, "سعيد": 0.8,
+    "مسرور": 0.6, "أحب": 0.5, "حب": 0.5, "شكرا": 0.3, "ممتع": 0.5,
+    "مفيد": 0.5, "سهل": 0.4, "نجاح": 0.5, "ناجح": 0.7, "أفضل": 0.9,
+    "عظيم": 0.9, "مذهل": 0.8, "بالتأكيد": 0.4, "أهلا": 0.6, "مرحبا": 0.5,
+    "صحيح": 0.3, "مبروك": 0.8, "لطيف": 0.6, "حسن": 0.5, "يسعدني": 0.8,
+    "سيء": -0.7, "سيئ": -0.7, "فظيع": -1.0, "حزين": -0.6, "أكره": -0.8,
+    "كره": -0.8, "آسف": -0.5, "للأسف": -0.5, "خطأ": -0.5, "فشل": -0.5,
+    "مشكلة": -0.3, "صعب": -0.5, "غاضب": -0.5, "مزعج": -0.8, "مستحيل": -0.7,
+    "ممل": -0.9, "مؤلم": -0.7, "أسوأ": -1.0, "ضعيف": -0.4, "معطل": -0.4,
+}
+
+NEGATIONS = {"not", "no", "never", "nothing", "dont", "isnt", "cant", "wont",
+             "لا", "لم", "لن", "ليس", "ليست", "غير", "ما"}
+INTENSIFIERS = {"very": 1.3, "really": 1.3, "extremely": 1.5, "so": 1.2, "too": 1.2,
+                "جدا": 1.3, "كثيرا": 1.3, "للغاية": 1.5}
+UNCERTAIN_PHRASES = ("not sure", "لست متأكد", "غير متأكد")
+
+def _compile(lexicon: Dict[str, float]) -> Dict[str, float]:
+    """Normalize lexicon keys the same way input text is tokenized"""
+    return {normalize_token(word): value for word, value in lexicon.items()}
+
+_POLARITY = {**_compile(ENGLISH_LEXICON), **_compile(ARABIC_LEXICON)}
+_NEGATIONS = {normalize_token(word) for word in NEGATIONS}
+_INTENSIFIERS = _compile(INTENSIFIERS)
+_UNCERTAIN = [re.compile(re.escape(phrase), re.IGNORECASE) for phrase in UNCERTAIN_PHRASES]
+
+class SentimentAnalyzer:
+    """Lexicon-based sentiment scoring for English and Arabic responses"""
+
+    def __init__(self, memo_size: int = 2048):
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[bytes, Tuple[float, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def _memo_get(self, key: bytes):
+        with self._lock:
+            result = self._memo.get(key)
+            if result is not None:
+                self._memo.move_to_end(key)
+            return result
+
+    def _memo_put(self, key: bytes, result: Tuple[float, bool]):
+        with self._lock:
+            self._memo[key] = result
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    @staticmethod
+    def _score(text: str) -> Tuple[float, bool]:
+        """Average polarity of sentiment words and whether the text sounds uncertain"""
+        scores = []
+        negate = False
+        boost = 1.0
+        for token in tokenize(text):
+            if token in _NEGATIONS:
+                negate = True
+                continue
+            if token in _INTENSIFIERS:
+                boost = _INTENSIFIERS[token]
+                continue
+            polarity = _POLARITY.get(token)
+            if polarity is not None:
+                polarity = max(-1.0, min(1.0, polarity * boost))
+                scores.append(-0.5 * polarity if negate else polarity)
+            negate = False
+            boost = 1.0
+
+        polarity = sum(scores) / len(scores) if scores else 0.0
+        uncertain = "?" in text or "؟" in text or any(p.search(text) for p in _UNCERTAIN)
+        return polarity, uncertain
+
+    def analyze(self, text: str) -> Tuple[float, bool]:
+        """Return (polarity, uncertain) for text"""
+        key = self._key(text)
+        result = self._memo_get(key)
+        if result is None:
+            result = self._score(text)
+            self._memo_put(key, result)
+        return result
+
+    def analyze_batch(self, texts: List[str]) -> List[Tuple[float, bool]]:
+        """Analyze several texts at once"""
+        return [self.analyze(text) for text in texts]
+
+    async def analyze_async(self, text: str) -> Tuple[float, bool]:
+        """Analyze text, scoring uncached texts in a worker thread"""
+        result = self._memo_get(self._key(text))
+        if result is not None:
+            return result
+        return await asyncio.to_thread(self.analyze, text)
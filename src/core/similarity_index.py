@@ -0,0 +1,82 @@
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+class SimilarityIndex:
+    """In-memory character n-gram index for finding near-duplicate prompts"""
+
+    def __init__(self, ngram_size: int = 3):
+        self.ngram_size = ngram_size
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._doc_keys: List[Optional[str]] = []  # None once removed
+        self._doc_sizes: List[int] = []
+        self._doc_names: List[Tuple[str, str]] = []
+        self._doc_ids: Dict[Tuple[str, str], int] = {}
+        self._key_docs: Dict[str, int] = {}
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Casefold, drop punctuation and collapse whitespace"""
+        text = re.sub(r"[^\w\s]", "", text.casefold())
+        return " ".join(text.split())
+
+    def _ngrams(self, text: str) -> Set[str]:
+        padded = f" {self.normalize(text)} "
+        if len(padded) <= self.ngram_size:
+            return {padded}
+        return {padded[i:i + self.ngram_size] for i in range(len(padded) - self.ngram_size + 1)}
+
+    def add(self, prompt: str, key: str, scope: str = ""):
+        """Index a prompt under its cache key, replacing older keys for the same prompt and scope"""
+        normalized = (scope, self.normalize(prompt))
+        if normalized in self._doc_ids:
+            doc_id = self._doc_ids[normalized]
+            self._key_docs.pop(self._doc_keys[doc_id], None)
+            self._doc_keys[doc_id] = key
+            self._key_docs[key] = doc_id
+            return
+
+        grams = self._ngrams(prompt)
+        doc_id = len(self._doc_keys)
+        self._doc_ids[normalized] = doc_id
+        self._key_docs[key] = doc_id
+        self._doc_keys.append(key)
+        self._doc_sizes.append(len(grams))
+        self._doc_names.append(normalized)
+        for gram in grams:
+            self._postings[gram].add(doc_id)
+
+    def remove(self, key: str):
+        """Forget the prompt indexed under key, if any"""
+        doc_id = self._key_docs.pop(key, None)
+        if doc_id is None:
+            return
+        self._doc_keys[doc_id] = None
+        scope, normalized = self._doc_names[doc_id]
+        del self._doc_ids[(scope, normalized)]
+        for gram in self._ngrams(normalized):
+            postings = self._postings[gram]
+            postings.discard(doc_id)
+            if not postings:
+                del self._postings[gram]
+
+    def lookup(self, prompt: str, threshold: float = 0.85, scope: str = "") -> Optional[Tuple[str, float]]:
+        """Return the cache key and score of the most similar prompt in scope above threshold"""
+        grams = self._ngrams(prompt)
+        overlaps: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for doc_id in self._postings.get(gram, ()):
+                overlaps[doc_id] += 1
+
+        best = None
+        for doc_id, overlap in overlaps.items():
+            if self._doc_names[doc_id][0] != scope:
+                continue
+            score = overlap / math.sqrt(len(grams) * self._doc_sizes[doc_id])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (self._doc_keys[doc_id], score)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._key_docs)
@@ -0,0 +1,75 @@
+import asyncio
+import collections
+import time
+from typing import Optional
+
+class SpeechQueue:
+    """Bounded queue delivering recognized speech from worker threads to an asyncio loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_pending: int = 3,
+                 merge_window: float = 2.0, max_merged_chars: int = 500):
+        self._loop = loop
+        self.max_pending = max_pending
+        self.merge_window = merge_window
+        self.max_merged_chars = max_merged_chars
+        self._pending: collections.deque = collections.deque()
+        self._last_put = 0.0
+        self._waiter: Optional[asyncio.Future] = None
+        self._closed = False
+        self.dropped = 0
+        self.merged = 0
+
+    def put_threadsafe(self, text: str):
+        """Queue text from any thread"""
+        self._loop.call_soon_threadsafe(self._put, text, time.monotonic())
+
+    def close_threadsafe(self):
+        """End get() once everything pending has been taken, from any thread"""
+        self._loop.call_soon_threadsafe(self._close)
+
+    def _put(self, text: str, received: float):
+        if self._closed:
+            return
+        if (self._pending and self.merge_window > 0 and received - self._last_put <= self.merge_window
+                and len(self._pending[-1]) + len(text) < self.max_merged_chars):
+            self._pending[-1] = f"{self._pending[-1]} {text}"
+            self.merged += 1
+        else:
+            self._pending.append(text)
+            if len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+        self._last_put = received
+        self._wake()
+
+    def _close(self):
+        self._closed = True
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def get(self) -> Optional[str]:
+        """Wait for the next utterance; None once the queue is closed and empty"""
+        while not self._pending:
+            if self._closed:
+                return None
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._pending.popleft()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        text = await self.get()
+        if text is None:
+            raise StopAsyncIteration
+        return text
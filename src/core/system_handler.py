@@ -1,68 +1,180 @@
+import asyncio
+import concurrent.futures
 import psutil
 import platform
 import subprocess
 import os
-from typing import Dict, List, Optional
+import hashlib
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+from utils.process_pool import spawn_process_pool
+from .file_index import FileIndex, IGNORED_DIRS
+from .file_walker import FileWalker
+from .content_search import ContentSearch
+from .resource_monitor import ResourceSampler
+from .system_info import SystemInfo
+from .process_monitor import ProcessMonitor, ProcessSample
+from .command_runner import CommandExecution, CommandRunner, parse_command
 
 class SystemHandler:
-    @staticmethod
-    def get_system_info() -> Dict[str, str]:
-        """Get basic system information"""
-        return {
-            "os": platform.system(),
-            "os_version": platform.version(),
-            "cpu": platform.processor(),
-            "memory_total": f"{psutil.virtual_memory().total / (1024**3):.2f} GB",
-            "memory_available": f"{psutil.virtual_memory().available / (1024**3):.2f} GB",
-            "disk_usage": f"{psutil.disk_usage('/').percent}%"
-        }
+    # Seconds after which a file index is refreshed in the background when searched
+    INDEX_REFRESH_INTERVAL = 300
     
-    @staticmethod
-    def get_resource_usage() -> Dict[str, float]:
-        """Get current resource usage"""
+    def __init__(self, index_dir: str = os.path.join('cache', 'file_index')):
+        self.index_dir = index_dir
+        self._file_indexes: Dict[str, FileIndex] = {}
+        self._index_lock = threading.Lock()
+        self._search_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self.resource_sampler: Optional[ResourceSampler] = None
+        self.system_info = SystemInfo()
+        self.process_monitor = ProcessMonitor()
+        self.command_runner = CommandRunner()
+        
+    def file_index(self, path: str = ".") -> FileIndex:
+        """The persistent file name index for a directory tree, opened once"""
+        root = os.path.abspath(path)
+        with self._index_lock:
+            # A tree inside an indexed root is served by that root's index
+            for indexed_root, index in self._file_indexes.items():
+                if root == indexed_root or root.startswith(indexed_root.rstrip(os.sep) + os.sep):
+                    return index
+            name = hashlib.sha1(root.encode('utf-8', 'surrogateescape')).hexdigest()
+            index = FileIndex(root, os.path.join(self.index_dir, f"{name}.idx"))
+            self._file_indexes[root] = index
+            return index
+            
+    def file_index_stats(self) -> List[Dict]:
+        """Size and freshness of every open file index"""
+        with self._index_lock:
+            return [index.stats() for index in self._file_indexes.values()]
+            
+    def get_system_info(self) -> Dict[str, str]:
+        """Get basic system information; static facts are computed once, the rest cached briefly"""
+        return self.system_info.get()
+        
+    async def get_system_info_async(self) -> Dict[str, str]:
+        """get_system_info without blocking the event loop on expired fields"""
+        return await self.system_info.refresh()
+        
+    def start_resource_sampler(self, interval: float = 1.0, history_seconds: float = 3600) -> ResourceSampler:
+        """Start sampling resource usage in the background"""
+        if self.resource_sampler is None:
+            self.resource_sampler = ResourceSampler(interval, capacity=max(1, int(history_seconds / interval)))
+            self.resource_sampler.start()
+        return self.resource_sampler
+        
+    def stop_resource_sampler(self):
+        if self.resource_sampler is not None:
+            self.resource_sampler.stop()
+            self.resource_sampler = None
+            
+    def resource_stats(self, seconds: Optional[float] = 60) -> Dict[str, Dict[str, float]]:
+        """Windowed statistics of every sampled metric; empty without a running sampler"""
+        if self.resource_sampler is None:
+            return {}
+        return {metric: self.resource_sampler.stats(metric, seconds) for metric in ResourceSampler.METRICS}
+        
+    def get_resource_usage(self) -> Dict[str, float]:
+        """Get current resource usage, from the background sampler when it runs"""
+        if self.resource_sampler is not None:
+            snapshot = self.resource_sampler.snapshot()
+            if snapshot:
+                return snapshot
         return {
             "cpu_percent": psutil.cpu_percent(),
             "memory_percent": psutil.virtual_memory().percent,
             "disk_percent": psutil.disk_usage('/').percent
         }
     
-    @staticmethod
-    def search_files(query: str, path: str = ".") -> List[str]:
+    def top_processes(self, n: int = 10, by: str = 'cpu') -> List[ProcessSample]:
+        """The n processes using the most cpu, memory or io"""
+        return self.process_monitor.top(n, by)
+        
+    async def top_processes_async(self, n: int = 10, by: str = 'cpu') -> List[ProcessSample]:
+        """top_processes off the event loop; waits one interval to measure rates when the last sample is old"""
+        if self.process_monitor.baseline_expired:
+            await asyncio.to_thread(self.process_monitor.sample)
+            await asyncio.sleep(self.process_monitor.min_interval)
+            # Timers may fire early, so don't let top() reuse the baseline as fresh
+            await asyncio.to_thread(self.process_monitor.sample)
+        return await asyncio.to_thread(self.process_monitor.top, n, by)
+        
+    def _searchable_index(self, path: str) -> FileIndex:
+        """The index for path, refreshed in the background when it is stale"""
+        index = self.file_index(path)
+        checked_at = index.checked_at
+        if checked_at is None or time.time() - checked_at > self.INDEX_REFRESH_INTERVAL:
+            index.update_in_background()
+        return index
+        
+    def search_files(self, query: str, path: str = ".") -> List[str]:
         """Search for files matching the query"""
-        results = []
+        index = self._searchable_index(path)
+        if index.is_built:
+            return index.search(query, under=path)
+            
+        # Walk the tree directly until the first index build finishes
         try:
-            for root, _, files in os.walk(path):
-                for file in files:
-                    if query.lower() in file.lower():
-                        results.append(os.path.join(root, file))
+            return list(self.walk_files(query, path))
         except Exception as e:
             print(f"Error searching files: {e}")
-        return results
-    
+            return []
+            
     @staticmethod
-    def execute_command(command: str) -> Optional[str]:
-        """Execute a system command safely"""
+    def walk_files(query: str, path: str = ".", limit: Optional[int] = None,
+                   max_depth: Optional[int] = None, ignore: Iterable[str] = IGNORED_DIRS) -> FileWalker:
+        """A parallel walk yielding files whose name contains query, as they are found"""
+        query = query.lower()
+        return FileWalker(path, match=lambda name: query in name.lower(),
+                          limit=limit, max_depth=max_depth, ignore=ignore)
+        
+    async def search_files_stream(self, query: str, path: str = ".",
+                                  limit: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield matching files, from the index when it is built or else from a live walk"""
+        index = self._searchable_index(path)
+        if index.is_built:
+            for result in await asyncio.to_thread(index.search, query, limit, path):
+                yield result
+            return
+        async for result in self.walk_files(query, path, limit=limit).stream():
+            yield result
+    
+    def search_contents(self, query: str, path: str = ".", **options) -> ContentSearch:
+        """A parallel search for files containing query; iterate it or use stream()"""
+        with self._index_lock:
+            # Worker processes are started once and shared by all searches
+            # A pool whose worker died is broken for good and is replaced
+            if self._search_pool is not None and self._search_pool._broken:
+                self._search_pool.shutdown(wait=False)
+                self._search_pool = None
+            if self._search_pool is None:
+                self._search_pool = spawn_process_pool()
+        return ContentSearch(path, query, executor=self._search_pool, **options)
+    
+    def execute_command(self, command: str, timeout: float = 5) -> Optional[str]:
+        """Execute a system command safely, without a shell"""
+        try:
+            args = parse_command(command, self.command_runner.allowed)
+        except ValueError as e:
+            return str(e)
         try:
-            # List of allowed commands/programs
-            allowed_commands = ['ls', 'dir', 'pwd', 'echo', 'date', 'time']
-            
-            # Basic command validation
-            cmd_parts = command.split()
-            if not cmd_parts or cmd_parts[0] not in allowed_commands:
-                return "Command not allowed for security reasons"
-            
             result = subprocess.run(
-                command,
-                shell=True,
+                args,
                 capture_output=True,
                 text=True,
-                timeout=5  # 5 second timeout
+                timeout=timeout
             )
-            return result.stdout if result.returncode == 0 else result.stderr
+            output = result.stdout if result.returncode == 0 else result.stderr
+            return output[:self.command_runner.max_output_bytes]
         except subprocess.TimeoutExpired:
             return "Command timed out"
         except Exception as e:
             return f"Error executing command: {str(e)}"
+            
+    def run_command(self, command: str, cwd: Optional[str] = None) -> CommandExecution:
+        """An execution streaming the output of an allowed command; raises ValueError otherwise"""
+        return self.command_runner.run(command, cwd)
     
     @staticmethod
     def check_drivers() -> Dict[str, List[str]]:
@@ -0,0 +1,74 @@
+import asyncio
+import platform
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+import psutil
+
+GB = 1024 ** 3
+
+@lru_cache(maxsize=None)
+def static_system_info() -> Dict[str, str]:
+    """Facts that cannot change while the process runs, computed once"""
+    return {
+        "os": platform.system(),
+        "os_version": platform.version(),
+        # May start a subprocess on Linux
+        "cpu": platform.processor() or platform.machine(),
+        "cpu_count": str(psutil.cpu_count() or 1),
+        "memory_total": f"{psutil.virtual_memory().total / GB:.2f} GB"
+    }
+
+class SystemInfo:
+    """System information with static facts memoized and dynamic fields cached per TTL"""
+
+    def __init__(self, disk_path: str = '/', ttls: Optional[Dict[str, float]] = None):
+        self.disk_path = disk_path
+        # Field name -> (source, reader of the source result, seconds to keep it)
+        self._fields: Dict[str, Tuple[str, Callable, float]] = {
+            "memory_available": ("memory", lambda memory: f"{memory.available / GB:.2f} GB", 2.0),
+            "disk_usage": ("disk", lambda disk: f"{disk.percent}%", 30.0)
+        }
+        self._sources: Dict[str, Callable] = {
+            "memory": psutil.virtual_memory,
+            "disk": lambda: psutil.disk_usage(self.disk_path)
+        }
+        for name, ttl in (ttls or {}).items():
+            source, reader, _ = self._fields[name]
+            self._fields[name] = (source, reader, ttl)
+        self._values: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, now: float):
+        return [name for name, (_, _, ttl) in self._fields.items()
+                if name not in self._values or now - self._values[name][0] >= ttl]
+
+    def _update(self, names, now: float):
+        results = {}
+        for name in names:
+            source, reader, _ = self._fields[name]
+            if source not in results:
+                results[source] = self._sources[source]()
+            self._values[name] = (now, reader(results[source]))
+
+    def get(self) -> Dict[str, str]:
+        """Static and dynamic fields, recomputing only the expired ones"""
+        now = time.monotonic()
+        with self._lock:
+            self._update(self._expired(now), now)
+            dynamic = {name: value for name, (_, value) in self._values.items()}
+        return {**static_system_info(), **dynamic}
+
+    async def refresh(self) -> Dict[str, str]:
+        """get() off the event loop"""
+        return await asyncio.to_thread(self.get)
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop a cached dynamic field (all of them by default) so the next read recomputes it"""
+        with self._lock:
+            if name is None:
+                self._values.clear()
+            else:
+                self._values.pop(name, None)
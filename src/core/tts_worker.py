@@ -0,0 +1,176 @@
+import queue
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+from .audio_cache import AudioCache, WavPlayer
+
+# A sentence ends at terminal punctuation (Latin or Arabic) followed by whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?؟؛…])\s+|\n+")
+
+class SpeechWorker(threading.Thread):
+    """Dedicated text-to-speech thread that owns the TTS engine"""
+
+    def __init__(self, engine_factory: Callable, volume: float = 1.0, rate: int = 150,
+                 voice: Optional[str] = None, audio_cache: Optional[AudioCache] = None,
+                 player: Optional[WavPlayer] = None):
+        super().__init__(name='tts-worker', daemon=True)
+        self._engine_factory = engine_factory
+        self._properties = {'volume': volume, 'rate': rate}
+        if voice:
+            self._properties['voice'] = voice
+        self.audio_cache = audio_cache
+        self._player = player
+        if audio_cache is not None and self._player is None:
+            self._player = WavPlayer()
+        if self._player is not None and not self._player.available:
+            self.audio_cache = None
+        self._queue: "queue.Queue" = queue.Queue()
+        self._buffer = ""
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._idle_since = 0.0
+        self.engine = None
+        self.error: Optional[Exception] = None
+
+    def run(self):
+        try:
+            self.engine = self._engine_factory()
+            self._apply_properties()
+        except Exception as e:
+            self.error = e
+            return
+        finally:
+            self._ready.set()
+
+        while True:
+            generation, text = self._queue.get()
+            if text is None:
+                break
+            if generation != self._generation:
+                continue
+            if isinstance(text, dict):
+                self._properties.update(text)
+                self._apply_properties()
+                continue
+            self._idle.clear()
+            try:
+                self._speak_sentence(text, generation)
+            except Exception as e:
+                print(f"Text-to-speech error: {e}")
+            finally:
+                with self._lock:
+                    if self._queue.empty():
+                        self._set_idle()
+
+    def _apply_properties(self):
+        for name, value in self._properties.items():
+            self.engine.setProperty(name, value)
+
+    def _audio_key(self, text: str) -> str:
+        voice = self._properties.get('voice')
+        if voice is None:
+            voice = self.engine.getProperty('voice')
+        return AudioCache.key(text, voice, self._properties['rate'], self._properties['volume'])
+
+    def _speak_sentence(self, text: str, generation: int):
+        """Play the cached audio for the sentence, rendering it first if it is new"""
+        if self.audio_cache is not None:
+            key = self._audio_key(text)
+            path = self.audio_cache.get(key) or self.audio_cache.render(self.engine, text, key)
+            if path is not None:
+                # A render cannot be stopped, so interrupt() may have come meanwhile
+                if generation == self._generation:
+                    self._player.play(path)
+                return
+        self.engine.say(text)
+        self.engine.runAndWait()
+
+    def wait_ready(self, timeout: Optional[float] = None):
+        """Block until the engine is created, re-raising any creation error"""
+        self._ready.wait(timeout)
+        if self.error is not None:
+            raise self.error
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued has been spoken"""
+        return self._idle.wait(timeout)
+
+    def _set_idle(self):
+        self._idle_since = time.monotonic()
+        self._idle.set()
+
+    def is_speaking(self, tail: float = 0.0) -> bool:
+        """Whether speech is queued or playing, or ended less than tail seconds ago"""
+        return not self._idle.is_set() or time.monotonic() - self._idle_since < tail
+
+    def _put(self, text):
+        if self.error is not None:
+            return
+        with self._lock:
+            if isinstance(text, str):
+                self._idle.clear()
+            self._queue.put((self._generation, text))
+
+    def speak(self, text: str):
+        """Queue text, split into sentences"""
+        for sentence in _SENTENCE_END.split(text):
+            if sentence.strip():
+                self._put(sentence.strip())
+
+    def feed(self, delta: str):
+        """Add streamed text, queueing each sentence as soon as it is complete"""
+        with self._lock:
+            self._buffer += delta
+            parts = _SENTENCE_END.split(self._buffer)
+            self._buffer = parts.pop()
+        for sentence in parts:
+            if sentence.strip():
+                self._put(sentence.strip())
+
+    def flush(self):
+        """Queue whatever streamed text is left after the last sentence"""
+        with self._lock:
+            remainder, self._buffer = self._buffer, ""
+        if remainder.strip():
+            self._put(remainder.strip())
+
+    def set_properties(self, **properties):
+        """Change engine properties (volume, rate, voice) from any thread"""
+        with self._lock:
+            self._queue.put((self._generation, dict(properties)))
+
+    def interrupt(self):
+        """Drop queued speech and stop the sentence being spoken"""
+        with self._lock:
+            self._generation += 1
+            self._buffer = ""
+            # Pending property changes must survive the interrupt
+            pending = []
+            while True:
+                try:
+                    _, text = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(text, dict):
+                    pending.append(text)
+            for properties in pending:
+                self._queue.put((self._generation, properties))
+        if self.engine is not None:
+            try:
+                self.engine.stop()
+            except Exception:
+                pass
+        if self._player is not None:
+            self._player.stop()
+        self._set_idle()
+
+    def shutdown(self):
+        """Stop the worker after interrupting any speech"""
+        self.interrupt()
+        with self._lock:
+            self._queue.put((self._generation, None))
@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+from utils.lazy_import import lazy_import
+
+np = lazy_import('numpy')
+sr = lazy_import('speech_recognition')
+
+def load_calibration(path: str) -> Optional[float]:
+    """Return the noise floor saved at path, if any"""
+    try:
+        with open(path, 'r') as f:
+            return float(json.load(f)['noise_floor'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def save_calibration(path: str, noise_floor: float, sample_rate: int):
+    """Save a noise floor measured at sample_rate"""
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'noise_floor': noise_floor, 'sample_rate': sample_rate}, f)
+    except OSError as e:
+        print(f"Error saving microphone calibration: {e}")
+
+class VoiceActivityDetector:
+    """Energy-based speech segmentation over a ring buffer of 16-bit mono PCM"""
+
+    def __init__(self, sample_rate: int, noise_floor: Optional[float] = None, ratio: float = 3.0,
+                 min_energy: float = 100.0, adapt_rate: float = 0.05, frame_ms: int = 30,
+                 hangover_ms: int = 600, preroll_ms: int = 300, min_speech_ms: int = 200,
+                 max_utterance_seconds: float = 15.0):
+        self.sample_rate = sample_rate
+        self.noise_floor = noise_floor
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.adapt_rate = adapt_rate
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.preroll = sample_rate * preroll_ms // 1000
+        self.max_utterance = int(sample_rate * max_utterance_seconds)
+
+        # The ring holds the longest utterance plus its pre-roll
+        self._capacity = self.max_utterance + self.preroll + self.frame_size
+        self._ring = np.zeros(self._capacity, dtype=np.int16)
+        self._written = 0     # Total samples ever written
+        self._analyzed = 0    # Total samples already split into frames
+        self._start: Optional[int] = None  # Sample where the current utterance starts
+        self._voiced = 0
+        self._silent = 0
+
+    @property
+    def threshold(self) -> float:
+        """Energy above which a frame counts as speech"""
+        if self.noise_floor is None:
+            return self.min_energy
+        return max(self.min_energy, self.noise_floor * self.ratio)
+
+    @property
+    def in_speech(self) -> bool:
+        return self._start is not None
+
+    def _write(self, samples):
+        position = self._written % self._capacity
+        head = min(len(samples), self._capacity - position)
+        self._ring[position:position + head] = samples[:head]
+        self._ring[:len(samples) - head] = samples[head:]
+        self._written += len(samples)
+
+    def _read(self, start: int, end: int) -> bytes:
+        start = max(start, self._written - self._capacity)
+        indices = np.arange(start, end) % self._capacity
+        return self._ring[indices].tobytes()
+
+    def process(self, pcm: bytes) -> List[bytes]:
+        """Add captured audio and return the utterances it completed"""
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        # Chunks larger than the ring are analyzed piecewise
+        utterances = []
+        for offset in range(0, len(samples), self._capacity // 2):
+            utterances.extend(self._process(samples[offset:offset + self._capacity // 2]))
+        return utterances
+
+    def _process(self, samples) -> List[bytes]:
+        self._write(samples)
+        count = (self._written - self._analyzed) // self.frame_size
+        if count == 0:
+            return []
+        frames = np.frombuffer(self._read(self._analyzed, self._analyzed + count * self.frame_size), dtype=np.int16)
+        energies = np.sqrt(np.mean(frames.reshape(count, self.frame_size).astype(np.float32) ** 2, axis=1))
+        if self.noise_floor is None:
+            self.noise_floor = float(np.min(energies))
+
+        utterances = []
+        for energy in energies.tolist():
+            frame_start = self._analyzed
+            self._analyzed += self.frame_size
+            speech = energy > self.threshold
+            if not speech:
+                self.noise_floor += self.adapt_rate * (energy - self.noise_floor)
+            elif self.in_speech:
+                # Creep towards louder backgrounds so a noise step cannot hold speech open forever
+                self.noise_floor += self.adapt_rate * 0.01 * (energy - self.noise_floor)
+
+            if self._start is None:
+                if speech:
+                    self._start = max(frame_start - self.preroll, 0)
+                    self._voiced, self._silent = 1, 0
+                continue
+
+            if speech:
+                self._voiced += 1
+                self._silent = 0
+            else:
+                self._silent += 1
+            if self._silent >= self.hangover_frames or self._analyzed - self._start >= self.max_utterance:
+                utterance = self._end_utterance()
+                if utterance is not None:
+                    utterances.append(utterance)
+        return utterances
+
+    def _end_utterance(self) -> Optional[bytes]:
+        start, self._start = self._start, None
+        if self._voiced < self.min_speech_frames:
+            return None
+        return self._read(start, self._analyzed)
+
+    def restart_utterance(self):
+        """Make the utterance in progress start at the current position"""
+        if self._start is not None:
+            self._start = self._analyzed
+            self._voiced = self._silent = 0
+
+    def discard(self):
+        """Drop the utterance in progress"""
+        self._start = None
+        self._voiced = self._silent = 0
+
+    def flush(self) -> Optional[bytes]:
+        """Return the utterance in progress, if any"""
+        if self._start is None:
+            return None
+        return self._end_utterance()
+
+class MicrophoneStream(threading.Thread):
+    """Long-lived microphone capture feeding a VoiceActivityDetector"""
+
+    SAVE_INTERVAL = 60.0
+
+    def __init__(self, on_utterance: Callable, calibration_file: str,
+                 device_index: Optional[int] = None, chunk_size: int = 1024,
+                 wake_word_factory: Optional[Callable] = None, wake_timeout: float = 8.0,
+                 muted: Optional[Callable[[], bool]] = None, **vad_options):
+        super().__init__(name='microphone-stream', daemon=True)
+        self.on_utterance = on_utterance
+        self.calibration_file = calibration_file
+        self.device_index = device_index
+        self.chunk_size = chunk_size
+        self.vad_options = vad_options
+        self.wake_word_factory = wake_word_factory
+        self.wake_timeout = wake_timeout
+        self.muted = muted
+        self.vad: Optional[VoiceActivityDetector] = None
+        self.wake_word = None
+        self._awake_until = 0.0
+        self._spotting = False
+        self.error: Optional[Exception] = None
+        self._stopped = threading.Event()
+
+    def save_calibration(self):
+        """Persist the current noise floor"""
+        if self.vad is not None and self.vad.noise_floor is not None:
+            save_calibration(self.calibration_file, self.vad.noise_floor, self.vad.sample_rate)
+
+    def run(self):
+        try:
+            with sr.Microphone(device_index=self.device_index, chunk_size=self.chunk_size) as source:
+                self.vad = VoiceActivityDetector(
+                    source.SAMPLE_RATE, noise_floor=load_calibration(self.calibration_file), **self.vad_options
+                )
+                if self.wake_word_factory is not None:
+                    self.wake_word = self.wake_word_factory(source.SAMPLE_RATE)
+                last_save = time.monotonic()
+                while not self._stopped.is_set():
+                    pcm = source.stream.read(source.CHUNK)
+                    for utterance in self._segment(pcm, time.monotonic()):
+                        self.on_utterance(sr.AudioData(utterance, source.SAMPLE_RATE, source.SAMPLE_WIDTH))
+                    if time.monotonic() - last_save > self.SAVE_INTERVAL:
+                        self.save_calibration()
+                        last_save = time.monotonic()
+        except Exception as e:
+            self.error = e
+            print(f"Microphone error: {e}")
+        finally:
+            self.save_calibration()
+
+    def _segment(self, pcm: bytes, now: float) -> List[bytes]:
+        """Run a chunk through the detectors and return the utterances to recognize"""
+        utterances = self.vad.process(pcm)
+        # The assistant's own voice neither reaches recognition nor wakes it
+        if self.muted is not None and self.muted():
+            self.vad.discard()
+            if self._spotting:
+                self.wake_word.reset()
+                self._spotting = False
+            return []
+        if self.wake_word is None:
+            return utterances
+        if now < self._awake_until:
+            if utterances or self.vad.in_speech:
+                self._awake_until = now + self.wake_timeout
+            return utterances
+
+        if not (utterances or self.vad.in_speech):
+            if self._spotting:
+                self.wake_word.reset()
+                self._spotting = False
+            return []
+        self._spotting = True
+        if self.wake_word.process(pcm) is not None:
+            self._awake_until = now + self.wake_timeout
+            self._spotting = False
+            # Whatever follows the phrase in the same breath is the command
+            self.vad.restart_utterance()
+        return []
+
+    def stop(self):
+        """Stop capturing after the current chunk"""
+        self._stopped.set()
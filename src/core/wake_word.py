@@ -0,0 +1,52 @@
+import os
+import tempfile
+from typing import List, Optional
+
+from utils.lazy_import import lazy_import
+
+pocketsphinx = lazy_import('pocketsphinx')
+
+class WakeWordDetector:
+    """Offline wake phrase spotting with pocketsphinx"""
+
+    def __init__(self, phrases: List[str], sample_rate: int = 16000, threshold: float = 1e-20):
+        phrases = [phrase.strip().lower() for phrase in phrases if phrase.strip()]
+        if not phrases:
+            raise ValueError("No wake phrases configured")
+
+        # pocketsphinx reads keyword lists from a file
+        with tempfile.NamedTemporaryFile('w', suffix='.kws', delete=False, encoding='utf-8') as f:
+            for phrase in phrases:
+                f.write(f"{phrase} /{threshold}/\n")
+        try:
+            self.decoder = pocketsphinx.Decoder(samprate=sample_rate, kws=f.name, loglevel='FATAL')
+        finally:
+            os.remove(f.name)
+
+        # Only words in the acoustic model's dictionary (English for the bundled one) can be spotted
+        self.phrases = [
+            phrase for phrase in phrases
+            if all(self.decoder.lookup_word(word) is not None for word in phrase.split())
+        ]
+        for phrase in set(phrases) - set(self.phrases):
+            print(f"Wake phrase not in the speech model's dictionary, ignored: {phrase}")
+        if not self.phrases:
+            raise ValueError("None of the wake phrases can be recognized by the speech model")
+        self.decoder.start_utt()
+
+    def process(self, pcm: bytes) -> Optional[str]:
+        """Feed 16-bit mono audio; return the wake phrase if it was just spoken"""
+        self.decoder.process_raw(pcm, False, False)
+        hypothesis = self.decoder.hyp()
+        if hypothesis is None:
+            return None
+        self.reset()
+        return hypothesis.hypstr
+
+    def reset(self):
+        """Forget audio heard so far"""
+        self.decoder.end_utt()
+        self.decoder.start_utt()
+
+    def close(self):
+        self.decoder.end_utt()
@@ -1,17 +1,23 @@
-from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QLineEdit, QPushButton, QMenu, QMessageBox, QTextBrowser, QFileDialog, QLabel
-from PyQt6.QtCore import Qt, QPoint
-from PyQt6.QtGui import QAction
+from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QMenu, QMessageBox, QTextBrowser, QFileDialog, QLabel, QListWidget, QListWidgetItem
+from PyQt6.QtCore import Qt, QPoint, QTimer, pyqtSignal
+from PyQt6.QtGui import QAction, QTextCursor, QTextCharFormat, QColor
 from .character_widget import CharacterWidget
 from core.ai_handler import AIState, AIHandler
 from .settings_dialog import SettingsDialog
 from core.system_handler import SystemHandler
 from utils.config import Config
 from utils.logger import Logger
+from utils.translations import Translations
 import qasync
 import asyncio
+import html
+import os
 from functools import partial
 
 class MainWindow(QMainWindow):
+    # Emitted with a subsystem name and whether it initialized successfully
+    subsystem_ready = pyqtSignal(str, bool)
+    
     def __init__(self):
         super().__init__()
         self.logger = Logger()
@@ -23,18 +29,92 @@ class MainWindow(QMainWindow):
         self.setup_menu()
         self.apply_theme()
         
-        # Initialize handlers
+        # Initialize handlers; the AI handler starts in the background once
+        # the window has been painted
+        self.ai_handler = None
+        self.system_handler = None
+        self._handler_task = None
+        self._closing = False
+        self._voice_task = None
+        self._command_executions = set()
+        self._command_lock = asyncio.Lock()
+        self._pending_commands = []
+        self.subsystem_ready.connect(self._on_subsystem_ready)
         try:
             api_key = self.config.get('ai.api_key')
             if not api_key:
                 self.logger.warning("No API key found in config")
                 self.show_api_key_message()
-            self.ai_handler = AIHandler(api_key) if api_key else None
+            else:
+                QTimer.singleShot(0, partial(self._start_ai_handler, api_key))
             self.system_handler = SystemHandler()
+            self.system_handler.start_resource_sampler(
+                self.config.get('system.sample_interval', 1.0),
+                self.config.get('system.sample_history_seconds', 3600)
+            )
         except Exception as e:
             self.logger.error(f"Error initializing handlers: {e}")
             self.show_error_message(str(e))
         
+    def _start_ai_handler(self, api_key):
+        """Start initializing the AI handler in the background, after closing the one it replaces"""
+        previous, self.ai_handler = self.ai_handler, None
+        self._handler_task = asyncio.ensure_future(
+            self._initialize_ai_handler(api_key, previous, self._handler_task)
+        )
+        
+    async def _release_ai_handler(self, previous, pending):
+        """Close the previous handler, or the one a still running initialization produces"""
+        if pending is not None and not pending.done():
+            previous = await pending
+        if previous is not None:
+            try:
+                await previous.close()
+            except Exception as e:
+                self.logger.error(f"Error closing AI handler: {e}")
+                
+    async def _initialize_ai_handler(self, api_key, previous=None, pending=None):
+        """Create the AI handler in a worker thread, then warm up its subsystems in parallel"""
+        # The old handler's speech worker and stores must be released first
+        await self._release_ai_handler(previous, pending)
+        try:
+            handler = await asyncio.to_thread(AIHandler, api_key, self.config)
+        except Exception as e:
+            self.logger.error(f"Error initializing AI handler: {e}")
+            self.subsystem_ready.emit('handler', False)
+            self.show_error_message(str(e))
+            return None
+            
+        if self._closing or self._handler_task is not asyncio.current_task():
+            # Replaced meanwhile; whoever replaced it closes the handler
+            return handler
+        self.ai_handler = handler
+        self.subsystem_ready.emit('handler', True)
+        
+        # Show the conversation restored from the journal
+        if handler.conversation_history:
+            self.refresh_chat_display()
+            
+        subsystems = ['client', 'stt']
+        if self.config.get('voice.enabled', True):
+            subsystems.append('tts')
+        for name, future in handler.warm_up(subsystems).items():
+            # Runs in the worker thread; the signal is delivered on the GUI thread
+            future.add_done_callback(
+                lambda f, name=name: self.subsystem_ready.emit(name, f.exception() is None)
+            )
+        return handler
+            
+    def _on_subsystem_ready(self, name, ok):
+        if ok:
+            self.logger.info(f"Subsystem ready: {name}")
+        else:
+            self.logger.warning(f"Subsystem failed to initialize: {name}")
+            
+    def _handler_starting(self):
+        """Whether the AI handler is still being initialized in the background"""
+        return self._handler_task is not None and not self._handler_task.done()
+        
     def show_api_key_message(self):
         msg = QMessageBox()
         msg.setIcon(QMessageBox.Icon.Warning)
@@ -115,6 +195,38 @@ class MainWindow(QMainWindow):
         self.character_widget = CharacterWidget()
         layout.addWidget(self.character_widget)
         
+        # Add history search box and results, hidden until requested
+        self.search_field = QLineEdit()
+        self.search_field.setPlaceholderText(self.tr("search_history"))
+        self.search_field.setClearButtonEnabled(True)
+        self.search_field.setStyleSheet("""
+            QLineEdit {
+                background-color: rgba(255, 255, 255, 200);
+                border-radius: 10px;
+                padding: 6px 15px;
+                font-size: 13px;
+                border: 1px solid rgba(200, 200, 200, 100);
+            }
+        """)
+        self.search_field.returnPressed.connect(qasync.asyncSlot()(self._search_history_async))
+        self.search_field.textChanged.connect(self._on_search_text_changed)
+        self.search_field.hide()
+        layout.addWidget(self.search_field)
+        
+        self.search_results = QListWidget()
+        self.search_results.setMaximumHeight(150)
+        self.search_results.setWordWrap(True)
+        self.search_results.setStyleSheet("""
+            QListWidget {
+                background-color: rgba(255, 255, 255, 220);
+                border-radius: 10px;
+                font-size: 12px;
+                border: 1px solid rgba(200, 200, 200, 100);
+            }
+        """)
+        self.search_results.hide()
+        layout.addWidget(self.search_results)
+        
         # Add chat display with improved styling
         self.chat_display = QTextBrowser()
         self.chat_display.setStyleSheet("""
@@ -144,6 +256,9 @@ class MainWindow(QMainWindow):
                 background-color: rgba(140, 140, 140, 200);
             }
         """)
+        # Scrolling to the top pages in older messages from the journal
+        self._older_loaded = 0
+        self.chat_display.verticalScrollBar().valueChanged.connect(self._on_chat_scrolled)
         layout.addWidget(self.chat_display)
         
         # Improved input field styling
@@ -162,9 +277,7 @@ class MainWindow(QMainWindow):
                 border: 1px solid rgba(140, 68, 173, 150);
             }
         """)
-        self.input_field.returnPressed.connect(
-            partial(qasync.asyncSlot(self._handle_command_async)())
-        )
+        self.input_field.returnPressed.connect(qasync.asyncSlot()(self._handle_command_async))
         layout.addWidget(self.input_field)
         
         # Buttons container with improved styling
@@ -282,6 +395,10 @@ class MainWindow(QMainWindow):
         load_chat_action.triggered.connect(self.load_chat_history)
         self.context_menu.addAction(load_chat_action)
         
+        search_action = QAction(self.tr("search_history"), self)
+        search_action.triggered.connect(self.toggle_search)
+        self.context_menu.addAction(search_action)
+        
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
             pos = event.pos()
@@ -384,30 +501,65 @@ class MainWindow(QMainWindow):
         """, ""))
         self.setCursor(Qt.CursorShape.ArrowCursor)
         
-    async def _handle_command_async(self):
-        """Async handler for processing commands"""
-        command = self.input_field.text()
+    async def _handle_command_async(self, command=None):
+        """Async handler for processing typed commands, or a given spoken one"""
+        if command is None:
+            command = self.input_field.text()
+            self.input_field.clear()
         if not command:
             return
             
-        self.input_field.clear()
+        # Slash commands run locally and never reach the AI
+        if command.startswith('/'):
+            await self._handle_local_command(command)
+            return
+        
+        shown = False
+        if self._handler_starting():
+            # Commands entered during startup are shown at once and wait for the handler
+            self.chat_display.append(f"<p style='color: #2c3e50'><b>You:</b> {command}</p>")
+            self._pending_commands.append(command)
+            self.character_widget.set_state(AIState.THINKING)
+            shown = True
+            
+        # One command at a time, in the order they were entered
+        async with self._command_lock:
+            await self._process_command(command, shown)
+            
+    async def _process_command(self, command, shown):
+        """Answer one command; the caller holds the command lock"""
+        if self._handler_starting():
+            await asyncio.shield(self._handler_task)
+        if shown:
+            self._pending_commands.remove(command)
         
         if not self.ai_handler:
             self.show_api_key_message()
             return
         
         try:
+            # New input cuts off whatever is still being spoken
+            self.ai_handler.stop_speaking()
+            
             # Update character state to processing
             self.character_widget.set_state(AIState.PROCESSING)
             
             # Add user message to chat display
-            self.chat_display.append(f"<p style='color: #2c3e50'><b>You:</b> {command}</p>")
+            if not shown:
+                self.chat_display.append(f"<p style='color: #2c3e50'><b>You:</b> {command}</p>")
             
             # Process command through AI
-            response, ai_state = await self.ai_handler.process_text_input(command)
-            
-            # Add AI response to chat display
-            self.chat_display.append(f"<p style='color: #8e44ad'><b>Assistant:</b> {response}</p>")
+            if self.config.get('ai.stream', True):
+                response, ai_state = await self._stream_response(command)
+            else:
+                response, ai_state = await self.ai_handler.process_text_input(command)
+                
+                # Add AI response to chat display
+                self.chat_display.append(f"<p style='color: #8e44ad'><b>Assistant:</b> {response}</p>")
+                
+                # If voice is enabled, speak the response
+                if self.config.get('voice.enabled', True):
+                    self.ai_handler.text_to_speech(response)
             self.chat_display.verticalScrollBar().setValue(
                 self.chat_display.verticalScrollBar().maximum()
             )
@@ -416,10 +568,6 @@ class MainWindow(QMainWindow):
             if ai_state:
                 self.character_widget.set_state(ai_state)
             
-            # If voice is enabled, speak the response
-            if self.config.get('voice.enabled', True):
-                await qasync.asyncio.to_thread(self.ai_handler.text_to_speech, response)
-            
             self.logger.info(f"Command processed: {command}")
             
         except Exception as e:
@@ -427,6 +575,154 @@ class MainWindow(QMainWindow):
             self.character_widget.set_state(AIState.ERROR)
             self.show_error_message(str(e))
             
+    async def _stream_response(self, command):
+        """Render the AI response incrementally as chunks arrive"""
+        self.chat_display.append("<p style='color: #8e44ad'><b>Assistant:</b> </p>")
+        response_format = QTextCharFormat()
+        response_format.setForeground(QColor("#8e44ad"))
+        # Anchored to this response's paragraph, so output appended meanwhile stays below it
+        block = self.chat_display.document().lastBlock()
+        
+        # Speech starts as soon as the first sentence is complete
+        speak = self.config.get('voice.enabled', True)
+        
+        chunks = []
+        async for delta in self.ai_handler.process_text_input_stream(command):
+            chunks.append(delta)
+            if speak:
+                self.ai_handler.speak_stream(delta)
+            cursor = QTextCursor(block)
+            cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+            cursor.insertText(delta, response_format)
+            # A newline in the delta continues the response in a new block
+            block = cursor.block()
+            self.chat_display.verticalScrollBar().setValue(
+                self.chat_display.verticalScrollBar().maximum()
+            )
+        if speak:
+            self.ai_handler.finish_speaking()
+            
+        return "".join(chunks), self.ai_handler.state
+        
+    async def _handle_local_command(self, command):
+        """Run a slash command on this machine, streaming its output into the chat"""
+        self.chat_display.append(f"<p style='color: #2c3e50'><b>You:</b> {html.escape(command)}</p>")
+        name, _, argument = command[1:].partition(' ')
+        handlers = {
+            'find': self._find_files,
+            'grep': self._search_contents,
+            'regex': partial(self._search_contents, regex=True),
+            'usage': self._resource_usage,
+            'system': self._system_info,
+            'top': self._top_processes,
+            'run': self._run_command,
+            'stop': self._stop_commands
+        }
+        # /usage, /system, /top and /stop work without an argument, the others need one
+        if name not in handlers or (not argument.strip() and name not in ('usage', 'system', 'top', 'stop')):
+            self.chat_display.append(f"<p style='color: #7f8c8d'>{html.escape(self.tr('local_commands_help'))}</p>")
+            return
+            
+        self.chat_display.append("<p style='color: #7f8c8d'></p>")
+        output_format = QTextCharFormat()
+        output_format.setForeground(QColor("#7f8c8d"))
+        block = self.chat_display.document().lastBlock()
+        try:
+            async for line in handlers[name](argument.strip()):
+                cursor = QTextCursor(block)
+                cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+                cursor.insertText(line + "\n", output_format)
+                block = cursor.block()
+                self.chat_display.verticalScrollBar().setValue(
+                    self.chat_display.verticalScrollBar().maximum()
+                )
+        except Exception as e:
+            self.logger.error(f"Error running {command}: {e}")
+            self.show_error_message(str(e))
+            
+    async def _find_files(self, query):
+        """Stream the files whose name contains query"""
+        root = os.path.expanduser(self.config.get('files.search_root', '~'))
+        count = 0
+        async for path in self.system_handler.search_files_stream(
+                query, root, limit=self.config.get('files.result_limit', 200)):
+            count += 1
+            yield path
+        yield f"{self.tr('results_found')}: {count}" if count else self.tr('no_results')
+        
+    async def _search_contents(self, query, regex=False):
+        """Stream the lines of files under the search root that contain query"""
+        root = os.path.expanduser(self.config.get('files.search_root', '~'))
+        search = self.system_handler.search_contents(
+            query, root, regex=regex,
+            limit=self.config.get('files.result_limit', 200),
+            timeout=self.config.get('files.content_timeout', 30.0),
+            max_file_size=int(self.config.get('files.content_max_file_mb', 10) * 1024 * 1024)
+        )
+        count = 0
+        async for match in search.stream():
+            count += 1
+            yield f"{match.path}:{match.line_number}: {match.line.strip()}"
+        if search.timed_out:
+            yield self.tr('search_timed_out')
+        yield f"{self.tr('results_found')}: {count}" if count else self.tr('no_results')
+        
+    async def _resource_usage(self, minutes=''):
+        """Yield current resource usage and its statistics over the last minutes (default 5)"""
+        try:
+            seconds = float(minutes) * 60 if minutes else 300
+        except ValueError:
+            yield self.tr('local_commands_help')
+            return
+        current = self.system_handler.get_resource_usage()
+        for metric, stats in self.system_handler.resource_stats(seconds).items():
+            if not stats:
+                continue
+            yield (f"{metric}: {current.get(metric, stats['max']):.1f} "
+                   f"({self.tr('usage_average')} {stats['average']:.1f}, p95 {stats['p95']:.1f}, "
+                   f"{self.tr('usage_peak')} {stats['max']:.1f})")
+            
+    async def _system_info(self, _=''):
+        """Yield one line per system information field"""
+        for field, value in (await self.system_handler.get_system_info_async()).items():
+            yield f"{field}: {value}"
+            
+    async def _top_processes(self, by=''):
+        """Yield the processes using the most cpu (default), memory or io"""
+        by = by or 'cpu'
+        if by not in ('cpu', 'memory', 'io'):
+            yield self.tr('local_commands_help')
+            return
+        for process in await self.system_handler.top_processes_async(10, by):
+            yield (f"{process.pid:>7}  {process.name[:24]:<24}  CPU {process.cpu_percent:5.1f}%  "
+                   f"RAM {process.memory_bytes / (1024**2):8.1f} MB  I/O {process.io_bytes_per_sec / 1024:8.1f} KB/s")
+            
+    async def _run_command(self, command):
+        """Stream the output of an allowed command as it is produced"""
+        try:
+            execution = self.system_handler.run_command(command)
+        except ValueError as e:
+            yield str(e)
+            return
+        self._command_executions.add(execution)
+        try:
+            async for line in execution.stream():
+                yield line.text
+        finally:
+            self._command_executions.discard(execution)
+        if execution.timed_out:
+            yield self.tr('command_timed_out')
+        elif execution.truncated:
+            yield self.tr('output_truncated')
+        elif execution.returncode:
+            yield f"{self.tr('exit_code')}: {execution.returncode}"
+            
+    async def _stop_commands(self, _=''):
+        """Cancel every running /run command"""
+        for execution in list(self._command_executions):
+            execution.cancel()
+        yield f"{self.tr('commands_stopped')}: {len(self._command_executions)}"
+            
     def save_chat_history(self):
         """Save chat history to a file"""
         if not self.ai_handler:
@@ -471,6 +767,44 @@ class MainWindow(QMainWindow):
         except Exception as e:
             self.show_error_message(f"Error loading chat history: {str(e)}")
             
+    def toggle_search(self):
+        """Show or hide the history search box"""
+        if self.search_field.isVisible():
+            self.search_field.clear()
+            self.search_field.hide()
+        else:
+            self.search_field.show()
+            self.search_field.setFocus()
+            
+    def _on_search_text_changed(self, text):
+        if not text:
+            self.search_results.clear()
+            self.search_results.hide()
+            
+    async def _search_history_async(self):
+        """Search past conversations and list the matching snippets"""
+        query = self.search_field.text().strip()
+        if not query or not self.ai_handler:
+            return
+            
+        try:
+            results = await asyncio.to_thread(self.ai_handler.search_history, query)
+        except Exception as e:
+            self.logger.error(f"Error searching history: {e}")
+            self.show_error_message(str(e))
+            return
+            
+        self.search_results.clear()
+        if not results:
+            self.search_results.addItem(self.tr("no_results"))
+        for result in results:
+            speaker = "You" if result["role"] == "user" else "Assistant"
+            date = result["timestamp"][:10]
+            item = QListWidgetItem(f"{speaker} · {date}: {result['snippet']}")
+            item.setToolTip(result["content"])
+            self.search_results.addItem(item)
+        self.search_results.show()
+        
     def clear_chat_history(self):
         """Clear chat history"""
         if not self.ai_handler:
@@ -488,21 +822,63 @@ class MainWindow(QMainWindow):
             self.ai_handler.clear_conversation_history()
             self.chat_display.clear()
             
+    @staticmethod
+    def _message_html(msg):
+        """The chat paragraph for a user or assistant message, or None for other roles"""
+        if msg["role"] == "user":
+            return f"<p style='color: #2c3e50'><b>You:</b> {msg['content']}</p>"
+        if msg["role"] == "assistant":
+            return f"<p style='color: #8e44ad'><b>Assistant:</b> {msg['content']}</p>"
+        return None
+        
     def refresh_chat_display(self):
         """Refresh the chat display with current conversation history"""
         self.chat_display.clear()
+        self._older_loaded = 0
         if not self.ai_handler:
             return
             
         for msg in self.ai_handler.conversation_history:
-            if msg["role"] == "user":
-                self.chat_display.append(
-                    f"<p style='color: #2c3e50'><b>You:</b> {msg['content']}</p>"
-                )
-            elif msg["role"] == "assistant":
-                self.chat_display.append(
-                    f"<p style='color: #8e44ad'><b>Assistant:</b> {msg['content']}</p>"
-                )
+            paragraph = self._message_html(msg)
+            if paragraph:
+                self.chat_display.append(paragraph)
+        # Commands typed while the handler was starting are still waiting for an answer
+        for command in self._pending_commands:
+            self.chat_display.append(f"<p style='color: #2c3e50'><b>You:</b> {command}</p>")
+        # Without a scroll bar there is no top to scroll to
+        scroll_bar = self.chat_display.verticalScrollBar()
+        while scroll_bar.maximum() == 0 and self.load_older_messages():
+            pass
+            
+    def _on_chat_scrolled(self, value):
+        if value == 0 and self.chat_display.verticalScrollBar().maximum() > 0:
+            self.load_older_messages()
+            
+    def load_older_messages(self, count=20):
+        """Insert the journaled messages before the shown ones at the top of the chat; False if there are none"""
+        if not self.ai_handler:
+            return False
+        try:
+            messages = self.ai_handler.load_older_messages(count, self._older_loaded)
+        except Exception as e:
+            self.logger.error(f"Error loading older messages: {e}")
+            return False
+        if not messages:
+            return False
+        self._older_loaded += len(messages)
+        
+        paragraphs = [paragraph for paragraph in map(self._message_html, messages) if paragraph]
+        if not paragraphs:
+            return True
+        # Keep the view on the message that was at the top
+        scroll_bar = self.chat_display.verticalScrollBar()
+        distance_from_bottom = scroll_bar.maximum() - scroll_bar.value()
+        cursor = QTextCursor(self.chat_display.document())
+        cursor.movePosition(QTextCursor.MoveOperation.Start)
+        cursor.insertHtml("".join(paragraphs))
+        cursor.insertBlock()
+        scroll_bar.setValue(scroll_bar.maximum() - distance_from_bottom)
+        return True
         
     def show_settings(self):
         dialog = SettingsDialog(self)
@@ -521,7 +897,11 @@ class MainWindow(QMainWindow):
             # Update AI handler with new API key
             api_key = self.config.get('ai.api_key')
             if api_key:
-                self.ai_handler = AIHandler(api_key)
+                if self.ai_handler:
+                    # Nothing captured by the old handler may reach the new one
+                    self._stop_voice_input(drop_pending=True)
+                    self.ai_handler.stop_speaking()
+                self._start_ai_handler(api_key)
             
             # Update character appearance
             gender = self.config.get('character.gender')
@@ -529,32 +909,62 @@ class MainWindow(QMainWindow):
             self.character_widget.set_character(gender, style)
             
             # Update voice settings in AI handler
-            if hasattr(self.ai_handler, 'tts_engine'):
+            if self.ai_handler:
                 volume = self.config.get('voice.volume', 1.0)
                 rate = self.config.get('voice.rate', 150)
-                self.ai_handler.tts_engine.setProperty('volume', volume)
-                self.ai_handler.tts_engine.setProperty('rate', rate)
+                self.ai_handler.set_voice_properties(volume, rate)
         
     def toggle_voice_input(self):
         """Toggle voice input on/off"""
         if not self.ai_handler:
-            self.show_api_key_message()
+            if not self._handler_starting():
+                self.show_api_key_message()
             self.voice_input_btn.setChecked(False)
             return
             
         if self.voice_input_btn.isChecked():
-            self.ai_handler.start_listening()
+            speech = self.ai_handler.start_listening()
+            self._voice_task = asyncio.ensure_future(self._dispatch_speech(speech))
             self.listening_label.setText(self.tr("listening"))
             self.character_widget.set_state(AIState.LISTENING)
         else:
+            self._stop_voice_input()
+            
+    def _stop_voice_input(self, drop_pending=False):
+        """Stop listening; utterances already recognized are still answered unless drop_pending"""
+        if self.ai_handler and self.ai_handler.is_listening:
             self.ai_handler.stop_listening()
-            self.listening_label.setText("")
-            self.character_widget.set_state(AIState.IDLE)
+        if drop_pending and self._voice_task is not None:
+            self._voice_task.cancel()
+            self._voice_task = None
+        self.voice_input_btn.setChecked(False)
+        self.listening_label.setText("")
+        self.character_widget.set_state(AIState.IDLE)
+            
+    async def _dispatch_speech(self, speech):
+        """Send each recognized utterance through the chat pipeline as it arrives"""
+        async for command in speech:
+            await self._handle_command_async(command)
             
     def closeEvent(self, event):
         # Stop voice input if active
         if self.ai_handler and hasattr(self.ai_handler, 'is_listening'):
             self.ai_handler.stop_listening()
+            self.ai_handler.stop_speaking()
+        if self.system_handler:
+            self.system_handler.stop_resource_sampler()
+        for execution in list(self._command_executions):
+            execution.cancel()
+            
+        if self.ai_handler or self._handler_starting():
+            # The window closes once the handler released its threads and stores
+            event.ignore()
+            if not self._closing:
+                self._closing = True
+                previous, self.ai_handler = self.ai_handler, None
+                release = asyncio.ensure_future(self._release_ai_handler(previous, self._handler_task))
+                release.add_done_callback(lambda _: self.close())
+            return
             
         # Save window geometry
         geometry = self.geometry()
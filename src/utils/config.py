@@ -12,11 +12,59 @@ class Config:
         "ai": {
             "model": "gpt-4-turbo-preview",
             "temperature": 0.7,
+            "stream": True,
+            "context_token_budget": 3000,
+            "summarize_history": True,
+            "timeout": 30.0,
+            "connect_timeout": 5.0,
+            "max_connections": 10,
+            "keepalive_expiry": 60.0,
+            "max_retries": 3,
+            "retry_base_delay": 0.5,
+            "retry_max_delay": 8.0,
+        },
+        "cache": {
+            "max_entries": 1000,
+            "max_size_mb": 50,
+            "ttl_hours": 168,
+            "similarity_enabled": False,
+            "similarity_threshold": 0.85,
+        },
+        "history": {
+            "directory": "history",
+            "restore_on_start": True,
+            "fsync": False,
         },
         "voice": {
             "enabled": True,
             "volume": 1.0,
             "rate": 150,
+            "voice_id": None,
+            "audio_cache": True,
+            "audio_cache_mb": 100,
+            "device_index": None,
+            "vad_ratio": 3.0,
+            "vad_hangover_ms": 600,
+            "max_utterance_seconds": 15.0,
+            "max_pending_utterances": 3,
+            "merge_window": 2.0,
+            "recognition_workers": 3,
+            "sphinx_processes": 1,
+            "wake_word_enabled": False,
+            "wake_phrases": ["hey assistant"],
+            "wake_threshold": 1e-20,
+            "wake_timeout": 8.0,
+            "echo_tail_seconds": 0.5,
+        },
+        "files": {
+            "search_root": "~",
+            "result_limit": 200,
+            "content_timeout": 30.0,
+            "content_max_file_mb": 10,
+        },
+        "system": {
+            "sample_interval": 1.0,
+            "sample_history_seconds": 3600,
         },
         "window": {
             "position_x": 100,
@@ -0,0 +1,11 @@
+import concurrent.futures
+import multiprocessing
+from typing import Optional
+
+def spawn_process_pool(max_workers: Optional[int] = None) -> concurrent.futures.ProcessPoolExecutor:
+    """A process pool whose workers are spawned instead of forked"""
+    # Forking copies only the calling thread, so a lock held by one of the
+    # application's other threads (Qt, audio capture, pools) would deadlock the child
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')
+    )
@@ -0,0 +1,25 @@
+import re
+from typing import List
+
+# Harakat, superscript alef and tatweel carry no meaning for matching
+_ARABIC_DIACRITICS = re.compile(r"[\u064b-\u0652\u0670\u0640]")
+_ARABIC_LETTER_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+})
+# Definite article with optional attached conjunction/preposition
+_ARABIC_ARTICLE = re.compile(r"^(?:[وفبكل]?ال|لل)(?=\w{2,})")
+_WORD = re.compile(r"\w+")
+
+def normalize_text(text: str) -> str:
+    """Casefold text and fold Arabic spelling variants and diacritics"""
+    text = _ARABIC_DIACRITICS.sub("", text.casefold())
+    return text.translate(_ARABIC_LETTER_MAP)
+
+def normalize_token(token: str) -> str:
+    """Normalize a single word, stripping the Arabic definite article"""
+    return _ARABIC_ARTICLE.sub("", normalize_text(token))
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized word tokens"""
+    return [_ARABIC_ARTICLE.sub("", word) for word in _WORD.findall(normalize_text(text))]
@@ -67,6 +67,21 @@ class Translations:
             "speech_recognition_error": "خطأ في التعرف على الصوت",
             "microphone_error": "خطأ في الوصول إلى الميكروفون",
             "offline_recognition": "التعرف على الصوت غير متصل",
+            
+            # History Search
+            "search_history": "البحث في المحادثات",
+            "no_results": "لا توجد نتائج",
+            
+            # Local Commands
+            "local_commands_help": "الأوامر المتاحة: /find <اسم الملف>، /grep <نص>، /regex <تعبير نمطي>، /usage [دقائق]، /system، /top [cpu|memory|io]، /run <أمر>، /stop",
+            "command_timed_out": "انتهت مهلة الأمر",
+            "output_truncated": "تم اقتطاع المخرجات",
+            "exit_code": "رمز الخروج",
+            "commands_stopped": "الأوامر المتوقفة",
+            "usage_average": "المتوسط",
+            "usage_peak": "الذروة",
+            "search_timed_out": "انتهت مهلة البحث",
+            "results_found": "عدد النتائج",
         },
         "en": {
             # General
@@ -135,6 +150,21 @@ class Translations:
             "speech_recognition_error": "Speech Recognition Error",
             "microphone_error": "Error accessing microphone",
             "offline_recognition": "Offline Recognition",
+            
+            # History Search
+            "search_history": "Search Conversations",
+            "no_results": "No results",
+            
+            # Local Commands
+            "local_commands_help": "Available commands: /find <file name>, /grep <text>, /regex <pattern>, /usage [minutes], /system, /top [cpu|memory|io], /run <command>, /stop",
+            "command_timed_out": "Command timed out",
+            "output_truncated": "Output truncated",
+            "exit_code": "Exit code",
+            "commands_stopped": "Commands stopped",
+            "usage_average": "average",
+            "usage_peak": "peak",
+            "search_timed_out": "Search timed out",
+            "results_found": "Results found",
         }
     }
 
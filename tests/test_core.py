@@ -1,13 +1,44 @@
 import unittest
 import sys
 import os
+import tempfile
+import importlib.util
+import re
+import asyncio
+import threading
+import time
+import sqlite3
+from types import SimpleNamespace
+import httpx
+import openai
 
 # Add src directory to Python path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from core.system_handler import SystemHandler
+from core.file_index import FileIndex
+from core.file_walker import FileWalker
+from core.content_search import ContentSearch, search_files
+from core.resource_monitor import ResourceSampler, percentile
+from core.system_info import SystemInfo
+from core.process_monitor import ProcessMonitor
+from core.command_runner import CommandRunner, parse_command
+import concurrent.futures
+from core.response_cache import ResponseCache
+from core.similarity_index import SimilarityIndex
+from core.context_builder import ContextBuilder
+from core.conversation_store import ConversationStore
+from core.search_index import ConversationSearchIndex
+from core.sentiment import SentimentAnalyzer
+from core.tts_worker import SpeechWorker
+from core.audio_cache import AudioCache
+from core.voice_capture import VoiceActivityDetector, MicrophoneStream
+from core.speech_queue import SpeechQueue
+from core.recognition_pool import RecognitionPipeline
+from core.ai_handler import AIHandler, AIError
 from utils.config import Config
 from utils.logger import Logger
+from utils.lazy_import import lazy_import, LazyModule
 
 class TestSystemHandler(unittest.TestCase):
     def setUp(self):
@@ -27,6 +58,986 @@ class TestSystemHandler(unittest.TestCase):
         self.assertIn('memory_percent', usage)
         self.assertIn('disk_percent', usage)
 
+class TestSystemInfo(unittest.TestCase):
+    def test_dynamic_fields_are_cached_until_expired(self):
+        info = SystemInfo(ttls={'memory_available': 0})
+        calls = []
+        read_disk = info._sources['disk']
+        info._sources['disk'] = lambda: calls.append('disk') or read_disk()
+        first = info.get()
+        second = info.get()
+        self.assertEqual(calls, ['disk'])
+        self.assertEqual(first['disk_usage'], second['disk_usage'])
+        info.invalidate('disk_usage')
+        info.get()
+        self.assertEqual(calls, ['disk', 'disk'])
+        
+    def test_refresh(self):
+        info = asyncio.run(SystemInfo().refresh())
+        for field in ('os', 'cpu', 'memory_total', 'memory_available', 'disk_usage'):
+            self.assertIn(field, info)
+
+class TestProcessMonitor(unittest.TestCase):
+    def test_cpu_delta_finds_busy_process(self):
+        monitor = ProcessMonitor(min_interval=0)
+        self.assertTrue(monitor.baseline_expired)
+        monitor.sample()
+        deadline = time.time() + 0.3
+        while time.time() < deadline:
+            pass
+        top = monitor.top(3, by='cpu')
+        self.assertLessEqual(len(top), 3)
+        self.assertIn(os.getpid(), [process.pid for process in top])
+        self.assertGreater(next(p for p in top if p.pid == os.getpid()).cpu_percent, 10)
+        
+    def test_first_async_top_measures_rates(self):
+        handler = SystemHandler()
+        handler.process_monitor.min_interval = 0.3
+        sampled = []
+        sample = handler.process_monitor.sample
+        handler.process_monitor.sample = lambda: sampled.append(True) or sample()
+        asyncio.run(handler.top_processes_async(3))
+        self.assertEqual(len(sampled), 2)
+        # An old sample is only a baseline; rates are measured over a new interval
+        handler.process_monitor._sampled_at -= handler.process_monitor.max_age + 1
+        asyncio.run(handler.top_processes_async(3))
+        self.assertEqual(len(sampled), 4)
+        asyncio.run(handler.top_processes_async(3))
+        self.assertEqual(len(sampled), 4)
+        
+    def test_top_by_memory_is_ordered(self):
+        monitor = ProcessMonitor()
+        top = monitor.top(5, by='memory')
+        self.assertEqual(top, sorted(top, key=lambda process: process.memory_bytes, reverse=True))
+        # A second call within min_interval reuses the sample
+        self.assertEqual(monitor.top(5, by='memory'), top)
+
+@unittest.skipIf(os.name == 'nt', "uses POSIX echo and ls")
+class TestCommandRunner(unittest.TestCase):
+    async def collect(self, execution, stop_after=None):
+        lines = []
+        async for line in execution.stream():
+            lines.append(line)
+            if stop_after is not None and len(lines) >= stop_after:
+                execution.cancel()
+        return lines
+        
+    def test_rejects_disallowed_commands(self):
+        for command in ['rm -rf /', '', 'echo hi; rm x']:
+            if command.startswith('echo'):
+                # Without a shell the separator is just an argument
+                self.assertEqual(parse_command(command), ['echo', 'hi;', 'rm', 'x'])
+            else:
+                self.assertRaises(ValueError, parse_command, command)
+        self.assertEqual(SystemHandler().execute_command('rm -rf /'), "Command not allowed for security reasons")
+        self.assertEqual(SystemHandler().execute_command('echo "a  b"').strip(), 'a  b')
+        
+    def test_streams_output_lines(self):
+        execution = CommandRunner().run('echo "hello  world" $HOME')
+        lines = asyncio.run(self.collect(execution))
+        self.assertEqual(lines[0].stream, 'stdout')
+        self.assertEqual(lines[0].text, 'hello  world $HOME')
+        self.assertEqual(execution.returncode, 0)
+        execution = CommandRunner().run('ls /nonexistent-directory')
+        lines = asyncio.run(self.collect(execution))
+        self.assertEqual(lines[0].stream, 'stderr')
+        self.assertNotEqual(execution.returncode, 0)
+        
+    def test_long_lines_are_delivered_in_pieces(self):
+        execution = CommandRunner().run('echo ' + 'x' * 100000)
+        lines = asyncio.run(self.collect(execution))
+        self.assertEqual(''.join(line.text for line in lines), 'x' * 100000)
+        self.assertEqual(len(lines), 2)
+        self.assertFalse(execution.truncated)
+        
+    def test_output_cap_and_cancel(self):
+        with tempfile.TemporaryDirectory() as root:
+            for i in range(50):
+                open(os.path.join(root, f'file{i:02}'), 'w').close()
+            execution = CommandRunner(max_output_bytes=60).run(f'ls -1 {root}')
+            lines = asyncio.run(self.collect(execution))
+            self.assertTrue(execution.truncated)
+            self.assertEqual(len(lines), 8)
+            execution = CommandRunner().run(f'ls -1 {root}')
+            lines = asyncio.run(self.collect(execution, stop_after=1))
+            self.assertLess(len(lines), 50)
+            self.assertIsNotNone(execution.returncode)
+
+class TestResourceSampler(unittest.TestCase):
+    def sample(self, value):
+        return {metric: float(value) for metric in ResourceSampler.METRICS}
+    
+    def test_ring_buffer_keeps_latest_samples(self):
+        sampler = ResourceSampler(capacity=4)
+        now = time.time()
+        for i in range(6):
+            sampler.record(self.sample(i), now - 5 + i)
+        self.assertEqual(sampler.window('cpu_percent'), [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(sampler.window('cpu_percent', 1.5), [4.0, 5.0])
+        self.assertEqual(sampler.snapshot()['memory_percent'], 5.0)
+        
+    def test_stats(self):
+        sampler = ResourceSampler(capacity=100)
+        now = time.time()
+        for i in range(1, 21):
+            sampler.record(self.sample(i), now - 20 + i)
+        stats = sampler.stats('disk_percent')
+        self.assertEqual(stats['samples'], 20)
+        self.assertEqual(stats['average'], 10.5)
+        self.assertEqual((stats['p50'], stats['p95'], stats['min'], stats['max']), (10.0, 19.0, 1.0, 20.0))
+        self.assertEqual(ResourceSampler().stats('cpu_percent'), {})
+        self.assertEqual(percentile([1.0], 95), 1.0)
+        
+    def test_system_handler_uses_sampler(self):
+        handler = SystemHandler()
+        self.assertEqual(handler.resource_stats(), {})
+        handler.start_resource_sampler(interval=0.05)
+        self.addCleanup(handler.stop_resource_sampler)
+        deadline = time.time() + 5
+        while not handler.resource_sampler.snapshot() and time.time() < deadline:
+            time.sleep(0.05)
+        usage = handler.get_resource_usage()
+        self.assertIn('timestamp', usage)
+        self.assertGreaterEqual(handler.resource_stats()['cpu_percent']['samples'], 1)
+
+class TestFileIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.temp_dir.name, 'tree')
+        for path in ['docs/Report_2024.pdf', 'docs/notes.txt', 'src/main.py', 'src/utils/ملف_عربي.txt', '.git/config']:
+            self.touch(path)
+        self.index_path = os.path.join(self.temp_dir.name, 'files.idx')
+        self.index = FileIndex(self.root, self.index_path)
+        self.addCleanup(self.temp_dir.cleanup)
+        self.addCleanup(self.index.close)
+    
+    def touch(self, path):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        open(full_path, 'w').close()
+    
+    def names(self, query, **options):
+        return sorted(os.path.basename(path) for path in self.index.search(query, **options))
+    
+    def test_substring_queries(self):
+        self.assertTrue(self.index.update())
+        self.assertEqual(self.names('report'), ['Report_2024.pdf'])
+        self.assertEqual(self.names('.TXT'), ['notes.txt', 'ملف_عربي.txt'])
+        self.assertEqual(self.names('عربي'), ['ملف_عربي.txt'])
+        self.assertEqual(self.names('n'), ['main.py', 'notes.txt'])
+        self.assertEqual(self.names('txt', under=os.path.join(self.root, 'docs')), ['notes.txt'])
+        self.assertEqual(self.names('config'), [])
+        self.assertEqual(self.names('missing'), [])
+    
+    def test_incremental_update_and_reload(self):
+        self.index.update()
+        self.assertFalse(self.index.update())
+        self.assertEqual(self.index.rescanned_dirs, 0)
+        
+        self.touch('src/utils/new_module.py')
+        self.assertTrue(self.index.update())
+        self.assertEqual(self.index.rescanned_dirs, 1)
+        self.assertEqual(self.names('.py'), ['main.py', 'new_module.py'])
+        
+        reopened = FileIndex(self.root, self.index_path)
+        self.addCleanup(reopened.close)
+        self.assertTrue(reopened.is_built)
+        self.assertEqual(reopened.stats()['files'], 5)
+        self.assertEqual(len(reopened.search('new_')), 1)
+
+class TestFileWalker(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        for path in ['a.txt', 'one/b.txt', 'one/two/c.txt', 'one/two/three/d.txt', 'build/e.txt', 'f.log']:
+            full_path = os.path.join(self.temp_dir.name, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            open(full_path, 'w').close()
+    
+    def names(self, walker):
+        return sorted(os.path.basename(path) for path in walker)
+    
+    def test_filters(self):
+        root = self.temp_dir.name
+        self.assertEqual(self.names(FileWalker(root, match=lambda name: name.endswith('.txt'))),
+                         ['a.txt', 'b.txt', 'c.txt', 'd.txt', 'e.txt'])
+        self.assertEqual(self.names(FileWalker(root, max_depth=1, ignore=['bui*', '*.log'])), ['a.txt', 'b.txt'])
+        self.assertEqual(len(list(FileWalker(root, limit=2))), 2)
+    
+    def test_stream_can_be_cancelled(self):
+        async def scenario():
+            walker = FileWalker(self.temp_dir.name)
+            walker.cancel()
+            return [path async for path in walker.stream()], walker
+        
+        async def full():
+            return [path async for path in FileWalker(self.temp_dir.name).stream()]
+        
+        self.assertEqual(len(asyncio.run(full())), 6)
+        results, walker = asyncio.run(scenario())
+        self.assertTrue(walker.cancelled)
+        self.assertEqual(results, [])
+
+class TestContentSearch(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.executor = concurrent.futures.ThreadPoolExecutor(2)
+        self.addCleanup(self.executor.shutdown)
+        files = {
+            'notes.txt': "first line\nTODO: write tests\nlast line\n",
+            'src/app.py': "import os\n\ndef main():\n    pass  # todo\n",
+            'src/ملاحظات.md': "مرحبا\nقائمة المهام: TODO\n",
+            'image.bin': "TODO\0\x01\x02",
+        }
+        for path, content in files.items():
+            full_path = os.path.join(self.temp_dir.name, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+    
+    def search(self, query, **options):
+        matches = ContentSearch(self.temp_dir.name, query, executor=self.executor, **options)
+        return sorted((os.path.basename(m.path), m.line_number, m.line, m.before, m.after) for m in matches)
+    
+    def test_literal_search_with_context(self):
+        self.assertEqual(self.search('todo'), [
+            ('app.py', 4, '    pass  # todo', ['def main():'], []),
+            ('notes.txt', 2, 'TODO: write tests', ['first line'], ['last line']),
+            ('ملاحظات.md', 2, 'قائمة المهام: TODO', ['مرحبا'], []),
+        ])
+        self.assertEqual(len(self.search('TODO', ignore_case=False, context=0)), 2)
+        self.assertEqual(self.search('المهام', context=0), [('ملاحظات.md', 2, 'قائمة المهام: TODO', [], [])])
+    
+    def test_regex_search_and_filters(self):
+        self.assertEqual(self.search(r'^def \w+\(', regex=True, context=0), [('app.py', 3, 'def main():', [], [])])
+        self.assertEqual([m[0] for m in self.search('todo', include=['*.txt'])], ['notes.txt'])
+        self.assertEqual(len(self.search('line', limit=1)), 1)
+        self.assertEqual(self.search('todo', max_file_size=20), [])
+        with self.assertRaises(re.error):
+            ContentSearch(self.temp_dir.name, '(unclosed', regex=True)
+    
+    def test_deadline_in_workers_is_reported(self):
+        self.assertEqual(search_files([os.path.join(self.temp_dir.name, 'notes.txt')],
+                                      b'TODO', 0, 0, 1024, time.time() - 1), ([], 0))
+        # The walk finishes in time, but the batches only start after the deadline
+        slow = concurrent.futures.ThreadPoolExecutor(2)
+        self.addCleanup(slow.shutdown)
+        submit = slow.submit
+        slow.submit = lambda fn, *args: submit(lambda: time.sleep(0.3) or fn(*args))
+        search = ContentSearch(self.temp_dir.name, 'todo', executor=slow, timeout=0.1)
+        self.assertEqual(list(search), [])
+        self.assertTrue(search.timed_out)
+        self.assertEqual(search.files_searched, 0)
+    
+    def test_worker_errors_are_raised(self):
+        failing = concurrent.futures.ThreadPoolExecutor(2)
+        self.addCleanup(failing.shutdown)
+        submit = failing.submit
+        failing.submit = lambda fn, *args: submit(lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            list(ContentSearch(self.temp_dir.name, 'todo', executor=failing))
+        failing.shutdown()
+        with self.assertRaises(RuntimeError):
+            list(ContentSearch(self.temp_dir.name, 'todo', executor=failing))
+    
+    def test_broken_shared_pool_is_replaced(self):
+        handler = SystemHandler()
+        self.addCleanup(lambda: handler._search_pool.shutdown(cancel_futures=True))
+        search = handler.search_contents('todo', self.temp_dir.name, context=0)
+        self.assertEqual(len(list(search)), 3)
+        self.assertEqual(search.files_searched, 4)
+        # A worker that dies breaks the whole pool
+        with self.assertRaises(concurrent.futures.process.BrokenProcessPool):
+            handler._search_pool.submit(os._exit, 1).result()
+        self.assertEqual(len(list(handler.search_contents('todo', self.temp_dir.name))), 3)
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'cache.db')
+        self.cache = ResponseCache(self.db_path, max_entries=3)
+    
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get('missing'))
+        self.cache.set('key', 'response')
+        self.assertEqual(self.cache.get('key'), 'response')
+        self.assertIn('key', self.cache)
+    
+    def test_persistence(self):
+        self.cache.set('key', 'response')
+        other = ResponseCache(self.db_path)
+        self.assertEqual(other.get('key'), 'response')
+        other.close()
+    
+    def test_lru_eviction(self):
+        for i in range(4):
+            self.cache.set(f'key{i}', 'response')
+            self.cache.get('key0')
+        self.cache.evict()
+        self.assertEqual(len(self.cache), 3)
+        self.assertIn('key0', self.cache)
+        self.assertNotIn('key1', self.cache)
+    
+    def test_access_times_are_written_later(self):
+        self.cache.set('key', 'response')
+        query = "SELECT accessed_at FROM responses WHERE key = 'key'"
+        with sqlite3.connect(self.db_path) as conn:
+            written = conn.execute(query).fetchone()[0]
+        self.cache.get('key')
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute(query).fetchone()[0], written)
+        self.cache.close()
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertGreater(conn.execute(query).fetchone()[0], written)
+        self.cache = ResponseCache(self.db_path)
+    
+    def test_ttl_expiry(self):
+        self.cache.ttl = -1
+        self.cache.set('key', 'response')
+        self.assertIsNone(self.cache.get('key'))
+    
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+class TestSimilarityIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SimilarityIndex()
+        self.index.add("What time is it?", "time_key")
+        self.index.add("How is the weather today", "weather_key")
+    
+    def test_exact_and_near_duplicates(self):
+        self.assertEqual(self.index.lookup("what time is it")[0], "time_key")
+        self.assertEqual(self.index.lookup("What time is it now?", 0.7)[0], "time_key")
+    
+    def test_below_threshold(self):
+        self.assertIsNone(self.index.lookup("Tell me a joke"))
+    
+    def test_same_prompt_replaces_key(self):
+        self.index.add("what time is it", "new_key")
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.lookup("What time is it?")[0], "new_key")
+    
+    def test_scopes_and_removal(self):
+        self.index.add("why?", "why_a", scope="conversation a")
+        self.index.add("why??", "why_b", scope="conversation b")
+        self.assertIsNone(self.index.lookup("why"))
+        self.assertEqual(self.index.lookup("why", scope="conversation b")[0], "why_b")
+        self.index.add("What time is it now", "time_now_key")
+        self.index.remove("time_key")
+        self.assertEqual(self.index.lookup("What time is it?", 0.7)[0], "time_now_key")
+        self.assertEqual(len(self.index), 4)
+        # A removed prompt can be indexed again
+        self.index.add("What time is it?", "time_key")
+        self.assertEqual(self.index.lookup("What time is it?")[0], "time_key")
+
+class TestContextBuilder(unittest.TestCase):
+    def setUp(self):
+        self.builder = ContextBuilder(token_budget=100)
+        self.history = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"message number {i} " * 5}
+            for i in range(20)
+        ]
+    
+    def test_fits_budget_with_newest_turns(self):
+        messages, start = self.builder.build("system", self.history)
+        self.assertGreater(start, 0)
+        self.assertEqual(messages[-1]["content"], self.history[-1]["content"])
+        self.assertEqual(len(messages), 1 + len(self.history) - start)
+        total = sum(self.builder.message_tokens(msg) for msg in messages)
+        self.assertLessEqual(total, 100)
+    
+    def test_summary_included(self):
+        messages, _ = self.builder.build("system", self.history, "earlier facts")
+        self.assertIn("earlier facts", messages[1]["content"])
+    
+    def test_keeps_latest_turn_over_budget(self):
+        history = [{"role": "user", "content": "word " * 500}]
+        messages, start = self.builder.build("system", history)
+        self.assertEqual(start, 0)
+        self.assertEqual(len(messages), 2)
+
+class TestConversationStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'conversation.jsonl')
+        self.store = ConversationStore(self.path)
+        for i in range(10):
+            self.store.append({"role": "user", "content": f"رسالة {i}"})
+    
+    def test_append_and_page(self):
+        self.assertEqual(len(self.store), 10)
+        self.assertEqual([m["content"] for m in self.store.page(2, 4)], ["رسالة 2", "رسالة 3"])
+        self.assertEqual(self.store.tail(1)[0]["content"], "رسالة 9")
+    
+    def test_recovers_after_crash(self):
+        self.store.close()
+        # Simulate a torn write and a lost index entry
+        with open(self.path, 'ab') as f:
+            f.write(b'{"role": "user", "cont')
+        with open(self.path + '.idx', 'r+b') as f:
+            f.truncate(8 * 8)
+        self.store = ConversationStore(self.path)
+        self.assertEqual(len(self.store), 10)
+        self.store.append({"role": "assistant", "content": "after"})
+        self.assertEqual(self.store.tail(2)[0]["content"], "رسالة 9")
+        self.assertEqual(self.store.tail(1)[0]["content"], "after")
+    
+    def test_rotate(self):
+        archive = self.store.rotate()
+        self.assertTrue(os.path.exists(archive))
+        self.assertEqual(len(self.store), 0)
+    
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+class TestConversationSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        journal_path = os.path.join(self.temp_dir.name, 'conversation.jsonl')
+        self.store = ConversationStore(journal_path)
+        self.index = ConversationSearchIndex(
+            os.path.join(self.temp_dir.name, 'search_index.db'),
+            os.path.join(self.temp_dir.name, 'conversation*.jsonl')
+        )
+        self.store.append({"role": "user", "content": "ما هي أفضل مدرسة في الرياض؟"})
+        self.store.append({"role": "assistant", "content": "The weather today is sunny and warm."})
+    
+    def test_arabic_normalized_search(self):
+        self.index.update()
+        results = self.index.search("المدرسه")
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["role"], "user")
+        self.assertIn("مدرسة", results[0]["snippet"])
+    
+    def test_incremental_update(self):
+        self.index.update()
+        self.assertEqual(self.index.search("python"), [])
+        self.store.append({"role": "user", "content": "How do I install Python packages?"})
+        self.index.update()
+        self.index.update()
+        self.assertEqual(len(self.index.search("python")), 1)
+        self.assertEqual(len(self.index.search("Weather")), 1)
+    
+    def test_rotated_journal_stays_searchable(self):
+        self.index.update()
+        archive = self.store.rotate()
+        self.index.rename_source(self.store.path, archive)
+        self.index.update()
+        self.assertEqual(len(self.index.search("weather")), 1)
+    
+    def tearDown(self):
+        self.store.close()
+        self.index.close()
+        self.temp_dir.cleanup()
+
+class TestSentimentAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = SentimentAnalyzer(memo_size=2)
+    
+    def test_english_and_arabic_polarity(self):
+        self.assertGreater(self.analyzer.analyze("This is a great idea!")[0], 0.3)
+        self.assertLess(self.analyzer.analyze("That was a terrible mistake")[0], -0.3)
+        self.assertGreater(self.analyzer.analyze("هذا رائع جداً")[0], 0.3)
+        self.assertLess(self.analyzer.analyze("للأسف حدث خطأ")[0], -0.3)
+    
+    def test_negation_and_uncertainty(self):
+        polarity, uncertain = self.analyzer.analyze("I am not sure")
+        self.assertLess(polarity, 0)
+        self.assertTrue(uncertain)
+        self.assertFalse(self.analyzer.analyze("The file is in your home folder")[1])
+    
+    def test_batch_and_memo(self):
+        results = self.analyzer.analyze_batch(["good", "bad", "good"])
+        self.assertEqual(results[0], results[2])
+        self.assertLessEqual(len(self.analyzer._memo), 2)
+
+class FakeCompletions:
+    """Stand-in for client.chat.completions; replies are strings, exceptions, or lists of stream chunks"""
+    def __init__(self, *replies, delay=0.0):
+        self.replies = list(replies)
+        self.delay = delay
+        self.calls = 0
+        
+    async def create(self, model, messages, stream=False):
+        self.calls += 1
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        await asyncio.sleep(self.delay)
+        if isinstance(reply, BaseException):
+            raise reply
+        if stream:
+            return self._stream(reply if isinstance(reply, list) else [reply])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+        
+    async def _stream(self, parts):
+        for part in parts:
+            if isinstance(part, BaseException):
+                raise part
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+
+class FakeClient:
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+        
+    async def close(self):
+        pass
+
+class AIHandlerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        # The response cache lives under the working directory
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+        config = Config(os.path.join(self.temp_dir.name, 'config.json'))
+        config.set('history.directory', os.path.join(self.temp_dir.name, 'history'))
+        config.set('ai.summarize_history', False)
+        config.set('ai.retry_base_delay', 0.0)
+        self.handler = AIHandler('test-key', config)
+        self.addCleanup(lambda: asyncio.run(self.handler.close()))
+        
+    def use_replies(self, *replies, delay=0.0) -> FakeCompletions:
+        completions = FakeCompletions(*replies, delay=delay)
+        self.handler._client = FakeClient(completions)
+        return completions
+
+class TestProcessTextInputStream(AIHandlerTestCase):
+    async def collect(self, text):
+        return [chunk async for chunk in self.handler.process_text_input_stream(text)]
+        
+    def test_chunks_are_committed_to_history_and_cache(self):
+        completions = self.use_replies(["Hello", " there."])
+        self.assertEqual(asyncio.run(self.collect("hi")), ["Hello", " there."])
+        self.assertEqual([m['content'] for m in self.handler.conversation_history], ["hi", "Hello there."])
+        # Asked again right away, the answer comes from the cache in one chunk
+        self.handler.conversation_history.clear()
+        self.assertEqual(asyncio.run(self.collect("hi")), ["Hello there."])
+        self.assertEqual(completions.calls, 1)
+        
+    def test_error_mid_stream(self):
+        self.use_replies(["Partial", ConnectionResetError("dropped")])
+        with self.assertRaises(AIError):
+            asyncio.run(self.collect("hi"))
+        self.assertNotIn("assistant", [m['role'] for m in self.handler.conversation_history])
+        self.assertEqual(self.handler._inflight, {})
+        self.use_replies(["Recovered."])
+        self.handler.conversation_history.clear()
+        self.assertEqual(asyncio.run(self.collect("hi")), ["Recovered."])
+
+def api_error(error_class, status):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return error_class("error", response=httpx.Response(status, request=request), body=None)
+
+class TestCompletionRetries(AIHandlerTestCase):
+    def complete(self):
+        return asyncio.run(self.handler._create_completion([{"role": "user", "content": "hi"}]))
+        
+    def test_transient_errors_are_retried(self):
+        rate_limited = api_error(openai.RateLimitError, 429)
+        completions = self.use_replies(rate_limited, rate_limited, "Hello!")
+        self.assertEqual(self.complete().choices[0].message.content, "Hello!")
+        self.assertEqual(completions.calls, 3)
+        
+    def test_max_retries_is_respected(self):
+        self.handler.config.set('ai.max_retries', 2)
+        completions = self.use_replies(api_error(openai.RateLimitError, 429))
+        with self.assertRaises(openai.RateLimitError):
+            self.complete()
+        self.assertEqual(completions.calls, 3)
+        
+    def test_other_errors_are_not_retried(self):
+        completions = self.use_replies(api_error(openai.BadRequestError, 400), "Hello!")
+        with self.assertRaises(openai.BadRequestError):
+            self.complete()
+        self.assertEqual(completions.calls, 1)
+
+class TestInflightCoalescing(AIHandlerTestCase):
+    def test_identical_prompts_share_one_request(self):
+        completions = self.use_replies("Hello!", delay=0.05)
+        async def ask_twice():
+            return await asyncio.gather(
+                self.handler.process_text_input("hi"), self.handler.process_text_input("hi")
+            )
+        first, second = asyncio.run(ask_twice())
+        self.assertEqual(first[0], "Hello!")
+        self.assertEqual(second[0], "Hello!")
+        self.assertEqual(completions.calls, 1)
+        self.assertEqual(self.handler._inflight, {})
+        
+    def test_leader_failure_reaches_follower(self):
+        completions = self.use_replies(ValueError("boom"), delay=0.05)
+        async def ask_twice():
+            return await asyncio.gather(
+                self.handler.process_text_input("hi"), self.handler.process_text_input("hi"),
+                return_exceptions=True
+            )
+        results = asyncio.run(ask_twice())
+        for result in results:
+            self.assertIsInstance(result, AIError)
+            self.assertIn("boom", str(result))
+        self.assertEqual(completions.calls, 1)
+        
+    def test_cancelled_leader_fails_follower(self):
+        self.use_replies("Too late", delay=1.0)
+        async def cancel_leader():
+            leader = asyncio.ensure_future(self.handler.process_text_input("hi"))
+            await asyncio.sleep(0.01)
+            follower = asyncio.ensure_future(self.handler.process_text_input("hi"))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            with self.assertRaises(AIError) as raised:
+                await follower
+            self.assertIn("cancelled", str(raised.exception))
+        asyncio.run(cancel_leader())
+        self.assertEqual(self.handler._inflight, {})
+
+class TestSimilarResponses(AIHandlerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.handler.config.set('cache.similarity_enabled', True)
+        self.handler.config.set('cache.similarity_threshold', 0.7)
+        
+    def ask(self, text):
+        return asyncio.run(self.handler.process_text_input(text))[0]
+        
+    def test_similar_prompts_only_match_in_the_same_context(self):
+        completions = self.use_replies("First answer.", "Second answer.", "Third answer.")
+        self.assertEqual(self.ask("What time is it?"), "First answer.")
+        self.handler.conversation_history.clear()
+        self.assertEqual(self.ask("what time is it now"), "First answer.")
+        self.assertEqual(completions.calls, 1)
+        # A follow-up in another conversation is not answered from the cache
+        self.handler.conversation_history[:] = [
+            {"role": "user", "content": "Tell me about Mars"},
+            {"role": "assistant", "content": "It is red."}
+        ]
+        self.assertEqual(self.ask("What time is it?"), "Second answer.")
+        self.assertEqual(completions.calls, 2)
+        
+    def test_evicted_entries_leave_the_index(self):
+        self.use_replies("First answer.")
+        self.ask("What time is it?")
+        self.handler._find_similar_response("warm up", "")
+        self.assertEqual(len(self.handler.similarity_index), 1)
+        self.handler.response_cache.max_entries = 0
+        self.handler.response_cache.evict()
+        self.assertEqual(len(self.handler.similarity_index), 0)
+
+class TestOlderMessages(AIHandlerTestCase):
+    def test_pages_continue_before_the_loaded_messages(self):
+        messages = [{"role": "user", "content": f"message {i}"} for i in range(10)]
+        for message in messages:
+            self.handler.conversation_store.append(message)
+        self.handler.conversation_history = messages[-2:]
+        self.assertEqual(self.handler.load_older_messages(3), messages[5:8])
+        self.assertEqual(self.handler.load_older_messages(3, loaded=3), messages[2:5])
+        self.assertEqual(self.handler.load_older_messages(3, loaded=6), messages[:2])
+        self.assertEqual(self.handler.load_older_messages(3, loaded=8), [])
+
+class TestAIHandlerClose(AIHandlerTestCase):
+    def test_close_stops_speech_worker_and_stores(self):
+        worker = SpeechWorker(FakeTTSEngine)
+        worker.start()
+        self.handler._speech_worker = worker
+        asyncio.run(self.handler.close())
+        self.assertFalse(worker.is_alive())
+        with self.assertRaises(sqlite3.ProgrammingError):
+            self.handler.response_cache.get('key')
+
+class FakeTTSEngine:
+    def __init__(self):
+        self.spoken = []
+        self.rendered = []
+        self.properties = {}
+    
+    def say(self, text):
+        self.spoken.append(text)
+    
+    def runAndWait(self):
+        pass
+    
+    def setProperty(self, name, value):
+        self.properties[name] = value
+    
+    def getProperty(self, name):
+        return self.properties.get(name)
+    
+    def save_to_file(self, text, path):
+        self.rendered.append(text)
+        with open(path, 'wb') as f:
+            f.write(text.encode('utf-8'))
+    
+    def stop(self):
+        pass
+
+class FakePlayer:
+    available = True
+    
+    def __init__(self):
+        self.played = []
+    
+    def play(self, path):
+        with open(path, 'rb') as f:
+            self.played.append(f.read().decode('utf-8'))
+    
+    def stop(self):
+        pass
+
+class TestSpeechWorker(unittest.TestCase):
+    def setUp(self):
+        self.engine = FakeTTSEngine()
+        self.worker = SpeechWorker(lambda: self.engine, volume=0.5, rate=120)
+        self.worker.start()
+        self.worker.wait_ready()
+    
+    def test_streamed_text_is_spoken_by_sentence(self):
+        for delta in ["Hello the", "re. How are", " you? مرحبا", " بك"]:
+            self.worker.feed(delta)
+        self.worker.flush()
+        self.assertTrue(self.worker.wait_idle(5))
+        self.assertEqual(self.engine.spoken, ["Hello there.", "How are you?", "مرحبا بك"])
+        self.assertEqual(self.engine.properties, {'volume': 0.5, 'rate': 120})
+    
+    def test_interrupt_drops_buffered_text(self):
+        self.worker.feed("Unfinished sentence")
+        self.worker.interrupt()
+        self.worker.flush()
+        self.worker.speak("Next answer.")
+        self.assertTrue(self.worker.wait_idle(5))
+        self.assertEqual(self.engine.spoken, ["Next answer."])
+    
+    def test_is_speaking_includes_tail(self):
+        self.assertFalse(self.worker.is_speaking())
+        self.worker.speak("Hello.")
+        self.assertTrue(self.worker.is_speaking())
+        self.assertTrue(self.worker.wait_idle(5))
+        self.assertFalse(self.worker.is_speaking())
+        self.assertTrue(self.worker.is_speaking(tail=60))
+    
+    def test_engine_failure_is_reported(self):
+        def failing_factory():
+            raise RuntimeError("no driver")
+        worker = SpeechWorker(failing_factory)
+        worker.start()
+        with self.assertRaises(RuntimeError):
+            worker.wait_ready()
+    
+    def tearDown(self):
+        self.worker.shutdown()
+        self.worker.join(5)
+
+class TestAudioCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.engine = FakeTTSEngine()
+        self.player = FakePlayer()
+        self.cache = AudioCache(self.temp_dir.name)
+    
+    def start_worker(self, **properties):
+        worker = SpeechWorker(lambda: self.engine, audio_cache=self.cache, player=self.player, **properties)
+        worker.start()
+        worker.wait_ready()
+        self.addCleanup(worker.join, 5)
+        self.addCleanup(worker.shutdown)
+        return worker
+    
+    def test_sentences_are_synthesized_once(self):
+        worker = self.start_worker()
+        worker.speak("Hello there. How can I help?")
+        self.assertTrue(worker.wait_idle(5))
+        worker.shutdown()
+        worker.join(5)
+        self.assertEqual(self.engine.rendered, ["Hello there.", "How can I help?"])
+        self.assertEqual(self.player.played, ["Hello there.", "How can I help?"])
+        self.assertEqual(self.engine.spoken, [])
+        
+        worker = self.start_worker()
+        worker.speak("Hello there. Goodbye.")
+        self.assertTrue(worker.wait_idle(5))
+        self.assertEqual(self.engine.rendered[2:], ["Goodbye."])
+        self.assertEqual(self.player.played[2:], ["Hello there.", "Goodbye."])
+    
+    def test_failed_render_is_spoken_directly(self):
+        self.engine.save_to_file = lambda text, path: open(path, 'wb').close()
+        worker = self.start_worker()
+        worker.speak("Hello there.")
+        self.assertTrue(worker.wait_idle(5))
+        self.assertEqual(self.engine.spoken, ["Hello there."])
+        self.assertEqual(self.player.played, [])
+    
+    def test_key_depends_on_voice_settings(self):
+        self.assertNotEqual(AudioCache.key("Hi", None, 150, 1.0), AudioCache.key("Hi", None, 120, 1.0))
+        self.assertNotEqual(AudioCache.key("Hi", "en", 150, 1.0), AudioCache.key("Hi", "ar", 150, 1.0))
+    
+    def test_least_recently_used_audio_is_evicted(self):
+        cache = AudioCache(self.temp_dir.name, max_size_bytes=12)
+        for index, text in enumerate(["aaaa", "bbbb", "cccc"]):
+            cache.render(self.engine, text, text)
+            os.utime(os.path.join(self.temp_dir.name, f"{text}.wav"), (index, index))
+        self.assertIsNotNone(cache.get("aaaa"))
+        cache.render(self.engine, "dddd", "dddd")
+        self.assertIsNone(cache.get("bbbb"))
+        self.assertIsNotNone(cache.get("aaaa"))
+        self.assertIsNotNone(cache.get("dddd"))
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+def pcm_signal(seconds, amplitude, rate=16000):
+    """A 220 Hz tone over low background noise, as 16-bit PCM"""
+    import numpy as np
+    t = np.arange(int(seconds * rate)) / rate
+    noise = np.random.default_rng(0).normal(0, 30, len(t))
+    return (amplitude * np.sin(2 * np.pi * 220 * t) + noise).astype(np.int16).tobytes()
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), "numpy is not installed")
+class TestVoiceActivityDetector(unittest.TestCase):
+    def test_segments_utterances_across_chunks(self):
+        vad = VoiceActivityDetector(16000)
+        audio = pcm_signal(1, 0) + pcm_signal(0.8, 4000) + pcm_signal(1, 0) + pcm_signal(0.5, 4000) + pcm_signal(1, 0)
+        utterances = []
+        for offset in range(0, len(audio), 2048):
+            utterances.extend(vad.process(audio[offset:offset + 2048]))
+        self.assertEqual(len(utterances), 2)
+        # Each utterance keeps its pre-roll and trailing hangover
+        self.assertAlmostEqual(len(utterances[0]) / 2 / 16000, 0.3 + 0.8 + 0.6, delta=0.1)
+        self.assertLess(vad.noise_floor, 100)
+    
+    def test_short_clicks_are_ignored(self):
+        vad = VoiceActivityDetector(16000, noise_floor=30.0)
+        self.assertEqual(vad.process(pcm_signal(0.03, 4000) + pcm_signal(1, 0)), [])
+    
+    def test_long_speech_is_cut_at_max_length(self):
+        vad = VoiceActivityDetector(16000, noise_floor=30.0, max_utterance_seconds=2.0)
+        utterances = vad.process(pcm_signal(5, 4000))
+        self.assertEqual(len(utterances), 2)
+        self.assertIsNotNone(vad.flush())
+
+class FakeWakeWord:
+    def __init__(self):
+        self.heard = 0
+        self.resets = 0
+        self.spoken_in = None
+    
+    def process(self, pcm):
+        self.heard += 1
+        if self.spoken_in is not None:
+            self.spoken_in -= 1
+            if self.spoken_in == 0:
+                self.spoken_in = None
+                return "hey assistant"
+        return None
+    
+    def reset(self):
+        self.resets += 1
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), "numpy is not installed")
+class TestWakeWordGate(unittest.TestCase):
+    def segment(self, stream, audio, start=0.0):
+        utterances = []
+        for index, offset in enumerate(range(0, len(audio), 1600)):
+            utterances.extend(stream._segment(audio[offset:offset + 1600], start + index * 0.05))
+        return utterances
+    
+    def test_only_speech_after_wake_phrase_is_delivered(self):
+        stream = MicrophoneStream(None, os.devnull, wake_timeout=3.0)
+        stream.vad = VoiceActivityDetector(16000, noise_floor=30.0)
+        stream.wake_word = FakeWakeWord()
+        
+        # Speech before the phrase is ignored, and trailing silence is not spotted
+        self.assertEqual(self.segment(stream, pcm_signal(0.3, 4000) + pcm_signal(1.5, 0)), [])
+        self.assertLess(stream.wake_word.heard, 20)
+        self.assertEqual(stream.wake_word.resets, 1)
+        
+        # The phrase is spotted mid-utterance; the rest of the breath is the command
+        stream.wake_word.spoken_in = 10
+        utterances = self.segment(stream, pcm_signal(1, 4000) + pcm_signal(1, 0), start=2.0)
+        self.assertEqual(len(utterances), 1)
+        self.assertAlmostEqual(len(utterances[0]) / 2 / 16000, 0.5 + 0.6, delta=0.1)
+        
+        # A follow-up within the timeout is delivered without the phrase
+        self.assertEqual(len(self.segment(stream, pcm_signal(0.5, 4000) + pcm_signal(1, 0), start=5.0)), 1)
+        # After the timeout the assistant is asleep again
+        self.assertEqual(self.segment(stream, pcm_signal(0.5, 4000) + pcm_signal(1, 0), start=20.0), [])
+        
+    def test_own_speech_is_dropped_while_muted(self):
+        speaking = [True]
+        stream = MicrophoneStream(None, os.devnull, muted=lambda: speaking[0])
+        stream.vad = VoiceActivityDetector(16000, noise_floor=30.0)
+        # The assistant's voice, even when it starts right before speech ends, is not delivered
+        self.assertEqual(self.segment(stream, pcm_signal(1, 4000)), [])
+        speaking[0] = False
+        self.assertEqual(self.segment(stream, pcm_signal(1, 0), start=1.0), [])
+        self.assertEqual(len(self.segment(stream, pcm_signal(0.5, 4000) + pcm_signal(1, 0), start=2.0)), 1)
+        
+    def test_muted_audio_does_not_wake(self):
+        stream = MicrophoneStream(None, os.devnull, wake_timeout=3.0, muted=lambda: True)
+        stream.vad = VoiceActivityDetector(16000, noise_floor=30.0)
+        stream.wake_word = FakeWakeWord()
+        stream.wake_word.spoken_in = 1
+        self.assertEqual(self.segment(stream, pcm_signal(1, 4000) + pcm_signal(1, 0)), [])
+        self.assertEqual(stream._awake_until, 0.0)
+
+class TestSpeechQueue(unittest.TestCase):
+    def drain(self, produce, **options):
+        """Run produce in a thread, then collect everything it queued"""
+        async def scenario():
+            speech = SpeechQueue(asyncio.get_running_loop(), **options)
+            producer = threading.Thread(target=produce, args=(speech,))
+            producer.start()
+            await asyncio.to_thread(producer.join)
+            speech.close_threadsafe()
+            return [text async for text in speech], speech
+        return asyncio.run(scenario())
+    
+    def test_burst_is_merged(self):
+        def produce(speech):
+            speech.put_threadsafe("open the")
+            speech.put_threadsafe("file please")
+            time.sleep(0.2)
+            speech.put_threadsafe("thanks")
+        texts, speech = self.drain(produce, merge_window=0.1)
+        self.assertEqual(texts, ["open the file please", "thanks"])
+        self.assertEqual(speech.merged, 1)
+    
+    def test_oldest_is_dropped_when_full(self):
+        def produce(speech):
+            for text in ["one", "two", "three", "four"]:
+                speech.put_threadsafe(text)
+        texts, speech = self.drain(produce, max_pending=2, merge_window=0)
+        self.assertEqual(texts, ["three", "four"])
+        self.assertEqual(speech.dropped, 2)
+    
+    def test_waiting_consumer_is_woken(self):
+        async def scenario():
+            speech = SpeechQueue(asyncio.get_running_loop())
+            threading.Timer(0.05, speech.put_threadsafe, args=("hello",)).start()
+            return await asyncio.wait_for(speech.get(), 5)
+        self.assertEqual(asyncio.run(scenario()), "hello")
+
+class TestRecognitionPipeline(unittest.TestCase):
+    def test_results_are_delivered_in_capture_order(self):
+        results = []
+        
+        def recognize(audio):
+            # Later segments finish first
+            text, delay = audio
+            time.sleep(delay)
+            if text == "fail":
+                raise RuntimeError("decoder crashed")
+            return text
+        
+        pipeline = RecognitionPipeline(recognize, results.append, max_workers=4)
+        for audio in [("one", 0.2), ("", 0.15), ("fail", 0.1), ("two", 0.05), ("three", 0)]:
+            pipeline.submit(audio)
+        pipeline.shutdown(wait=True)
+        self.assertEqual(results, ["one", "two", "three"])
+
 class TestConfig(unittest.TestCase):
     def setUp(self):
         self.config = Config('test_config.json')
@@ -46,6 +1057,19 @@ class TestConfig(unittest.TestCase):
         if os.path.exists('test_config.json'):
             os.remove('test_config.json')
 
+class TestLazyImport(unittest.TestCase):
+    def test_defers_import_until_attribute_access(self):
+        sys.modules.pop('colorsys', None)
+        module = lazy_import('colorsys')
+        self.assertIsInstance(module, LazyModule)
+        self.assertFalse(module.is_loaded)
+        self.assertNotIn('colorsys', sys.modules)
+        self.assertEqual(module.rgb_to_hsv(1, 0, 0), (0.0, 1.0, 1))
+        self.assertTrue(module.is_loaded)
+    
+    def test_returns_loaded_module(self):
+        self.assertIs(lazy_import('os'), os)
+
 class TestLogger(unittest.TestCase):
     def setUp(self):
         self.logger = Logger('test_logger')